@@ -0,0 +1,117 @@
+"""
+Benchmarks for the scope extraction and lfn2pfn algorithms.
+
+Run as::
+
+    python benchmarks/bench_algorithms.py
+"""
+
+import random
+import time
+from collections import Counter, deque
+
+from dirac_rucio_policy.algorithms import (
+    ScopeRule,
+    ScopeRules,
+    extract_scope_dirac,
+    extract_scopes_dirac,
+    get_hash_fanout,
+    lfn2pfn_dirac,
+    lfn2pfn_dirac_hash,
+)
+
+N_LFNS = 1_000_000
+
+
+def make_lfns(n=N_LFNS, seed=0):
+    """CTAO-style LFNs, like the long ones in test_algorithms.py."""
+    rng = random.Random(seed)
+    scopes = ["dl0", "dl1", "dl2", "test", "mc", "calibration"]
+    lfns = []
+    for i in range(n):
+        tel = rng.randint(1, 100)
+        obs_id = 2000000000 + rng.randint(0, 99999)
+        lfns.append(
+            f"/ctao/{rng.choice(scopes)}/telescope/TEL{tel:03d}/events/2024/06/17/"
+            f"TEL{tel:03d}_SDH001_20240617T030105_SBID2000012345_OBSID{obs_id}"
+            f"_TEL_SHOWER_CHUNK{i % 1000:03d}.fits.fz"
+        )
+    return lfns
+
+
+def extract_scope_split(did, scopes):
+    """Previous implementation, splitting the full LFN."""
+    msg = f"DID {did!r} does not match expected schema: /<VO Name>/<scope>/<path>."
+    if not did.startswith("/"):
+        raise ValueError(msg)
+    components = [comp for comp in did.split("/") if comp != ""]
+    if len(components) < 2:
+        return "root", did
+    return components[1], did
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    deque(map(function, *args), maxlen=0)
+    return time.perf_counter() - start
+
+
+def bench_extract_scope(lfns):
+    no_scopes = [None] * len(lfns)
+    before = timed(extract_scope_split, lfns, no_scopes)
+    after = timed(extract_scope_dirac, lfns, no_scopes)
+    print(f"extract_scope over {len(lfns):,d} LFNs")
+    print(f"  split full LFN   {1e9 * before / len(lfns):8.1f} ns / call")
+    print(f"  scan to scope    {1e9 * after / len(lfns):8.1f} ns / call")
+    print(f"  speedup          {before / after:8.2f}x")
+
+
+def bench_extract_scopes(lfns):
+    start = time.perf_counter()
+    [extract_scope_dirac(lfn, None) for lfn in lfns]
+    scalar = time.perf_counter() - start
+
+    start = time.perf_counter()
+    extract_scopes_dirac(lfns)
+    bulk = time.perf_counter() - start
+
+    print(f"bulk extract_scopes over {len(lfns):,d} LFNs")
+    print(f"  scalar per LFN   {1e9 * scalar / len(lfns):8.1f} ns / LFN")
+    print(f"  bulk             {1e9 * bulk / len(lfns):8.1f} ns / LFN")
+
+
+def bench_scope_rules(lfns):
+    print(f"scope rules over {len(lfns):,d} LFNs")
+    for n_rules in (10, 10_000):
+        rules = {f"/vo{i}.org": ScopeRule() for i in range(n_rules)}
+        rules["/ctao"] = ScopeRule(depth=1)
+        seconds = timed(ScopeRules(rules).extract, lfns)
+        print(f"  {n_rules:6d} rules     {1e9 * seconds / len(lfns):8.1f} ns / call")
+
+
+def bench_lfn2pfn_hash(lfns):
+    print(f"lfn2pfn over {len(lfns):,d} LFNs")
+    for function in (lfn2pfn_dirac, lfn2pfn_dirac_hash):
+        start = time.perf_counter()
+        paths = [function("test", lfn, "RSE", {}, {}) for lfn in lfns]
+        seconds = time.perf_counter() - start
+        print(f"  {function.__name__:<20s} {1e9 * seconds / len(lfns):8.1f} ns / call")
+
+    # distribution of the files over the leaf hash directories
+    depth, width = get_hash_fanout()
+    n_dirs = 16 ** (depth * width)
+    counts = Counter(tuple(path.rsplit("/", depth + 1)[1:-1]) for path in paths)
+    expected = len(paths) / n_dirs
+    chi2 = sum((counts.get(d, 0) - expected) ** 2 / expected for d in counts)
+    chi2 += (n_dirs - len(counts)) * expected
+    print(f"  {n_dirs} directories, expected {expected:.1f} files each")
+    print(f"  min / max files: {min(counts.values())} / {max(counts.values())}")
+    print(f"  chi2 / ndf: {chi2 / (n_dirs - 1):.3f} (uniform: ~1)")
+
+
+if __name__ == "__main__":
+    lfns = make_lfns()
+    bench_extract_scope(lfns)
+    bench_extract_scopes(lfns)
+    bench_scope_rules(lfns[:100_000])
+    bench_lfn2pfn_hash(lfns)
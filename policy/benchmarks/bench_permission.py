@@ -0,0 +1,464 @@
+"""
+Micro-benchmarks for the permission checks of the policy package.
+
+Requires a rucio configuration, e.g. run as::
+
+    RUCIO_CONFIG=../rucio/rucio.cfg python benchmarks/bench_permission.py
+"""
+
+import math
+import timeit
+
+from rucio.common.constants import RseAttr
+from rucio.common.types import InternalAccount
+from rucio.core.rse import list_rse_attributes
+from rucio.core.rse_expression_parser import parse_expression
+
+from dirac_rucio_policy import identities, lifetime_exceptions, permission, rses
+
+N_CALLS = 200_000
+
+
+def report(name, seconds, n=N_CALLS):
+    print(f"{name:<40s} {1e9 * seconds / n:8.1f} ns / call")
+
+
+# the permission checks under the names used by the baseline has_permission
+_PERMISSIONS = permission.PERMISSIONS
+perm_add_account = _PERMISSIONS["add_account"]
+perm_del_account = _PERMISSIONS["del_account"]
+perm_update_account = _PERMISSIONS["update_account"]
+perm_add_rule = _PERMISSIONS["add_rule"]
+perm_add_subscription = _PERMISSIONS["add_subscription"]
+perm_add_scope = _PERMISSIONS["add_scope"]
+perm_add_rse = _PERMISSIONS["add_rse"]
+perm_update_rse = _PERMISSIONS["update_rse"]
+perm_add_protocol = _PERMISSIONS["add_protocol"]
+perm_del_protocol = _PERMISSIONS["del_protocol"]
+perm_update_protocol = _PERMISSIONS["update_protocol"]
+perm_add_qos_policy = _PERMISSIONS["add_qos_policy"]
+perm_delete_qos_policy = _PERMISSIONS["delete_qos_policy"]
+perm_declare_bad_file_replicas = _PERMISSIONS["declare_bad_file_replicas"]
+perm_declare_suspicious_file_replicas = _PERMISSIONS["declare_suspicious_file_replicas"]
+perm_add_replicas = _PERMISSIONS["add_replicas"]
+perm_delete_replicas = _PERMISSIONS["delete_replicas"]
+perm_skip_availability_check = _PERMISSIONS["skip_availability_check"]
+perm_update_replicas_states = _PERMISSIONS["update_replicas_states"]
+perm_add_rse_attribute = _PERMISSIONS["add_rse_attribute"]
+perm_del_rse_attribute = _PERMISSIONS["del_rse_attribute"]
+perm_del_rse = _PERMISSIONS["del_rse"]
+perm_del_rule = _PERMISSIONS["del_rule"]
+perm_update_rule = _PERMISSIONS["update_rule"]
+perm_approve_rule = _PERMISSIONS["approve_rule"]
+perm_update_subscription = _PERMISSIONS["update_subscription"]
+perm_reduce_rule = _PERMISSIONS["reduce_rule"]
+perm_move_rule = _PERMISSIONS["move_rule"]
+perm_get_auth_token_user_pass = _PERMISSIONS["get_auth_token_user_pass"]
+perm_get_auth_token_gss = _PERMISSIONS["get_auth_token_gss"]
+perm_get_auth_token_x509 = _PERMISSIONS["get_auth_token_x509"]
+perm_get_auth_token_saml = _PERMISSIONS["get_auth_token_saml"]
+perm_add_account_identity = _PERMISSIONS["add_account_identity"]
+perm_add_did = _PERMISSIONS["add_did"]
+perm_add_dids = _PERMISSIONS["add_dids"]
+perm_attach_dids = _PERMISSIONS["attach_dids"]
+perm_detach_dids = _PERMISSIONS["detach_dids"]
+perm_attach_dids_to_dids = _PERMISSIONS["attach_dids_to_dids"]
+perm_create_did_sample = _PERMISSIONS["create_did_sample"]
+perm_set_metadata = _PERMISSIONS["set_metadata"]
+perm_set_metadata_bulk = _PERMISSIONS["set_metadata_bulk"]
+perm_set_status = _PERMISSIONS["set_status"]
+perm_queue_requests = _PERMISSIONS["queue_requests"]
+perm_set_rse_usage = _PERMISSIONS["set_rse_usage"]
+perm_set_rse_limits = _PERMISSIONS["set_rse_limits"]
+perm_list_requests = _PERMISSIONS["list_requests"]
+perm_list_requests_history = _PERMISSIONS["list_requests_history"]
+perm_get_request_by_did = _PERMISSIONS["get_request_by_did"]
+perm_get_request_history_by_did = _PERMISSIONS["get_request_history_by_did"]
+perm_cancel_request = _PERMISSIONS["cancel_request"]
+perm_get_next = _PERMISSIONS["get_next"]
+perm_set_local_account_limit = _PERMISSIONS["set_local_account_limit"]
+perm_set_global_account_limit = _PERMISSIONS["set_global_account_limit"]
+perm_delete_local_account_limit = _PERMISSIONS["delete_local_account_limit"]
+perm_delete_global_account_limit = _PERMISSIONS["delete_global_account_limit"]
+perm_config = _PERMISSIONS["config_sections"]
+perm_get_local_account_usage = _PERMISSIONS["get_local_account_usage"]
+perm_get_global_account_usage = _PERMISSIONS["get_global_account_usage"]
+perm_add_account_attribute = _PERMISSIONS["add_attribute"]
+perm_del_account_attribute = _PERMISSIONS["del_attribute"]
+perm_list_heartbeats = _PERMISSIONS["list_heartbeats"]
+perm_resurrect = _PERMISSIONS["resurrect"]
+perm_update_lifetime_exceptions = _PERMISSIONS["update_lifetime_exceptions"]
+perm_get_auth_token_ssh = _PERMISSIONS["get_auth_token_ssh"]
+perm_get_signed_url = _PERMISSIONS["get_signed_url"]
+perm_add_bad_pfns = _PERMISSIONS["add_bad_pfns"]
+perm_del_account_identity = _PERMISSIONS["del_account_identity"]
+perm_del_identity = _PERMISSIONS["del_identity"]
+perm_remove_did_from_followed = _PERMISSIONS["remove_did_from_followed"]
+perm_remove_dids_from_followed = _PERMISSIONS["remove_dids_from_followed"]
+perm_export = _PERMISSIONS["export"]
+perm_default = permission.perm_default
+
+
+def has_permission_baseline(issuer, action, kwargs, *, session=None):
+    """has_permission as before, building the literal action table on each call."""
+    perm = {
+        "add_account": perm_add_account,
+        "del_account": perm_del_account,
+        "update_account": perm_update_account,
+        "add_rule": perm_add_rule,
+        "add_subscription": perm_add_subscription,
+        "add_scope": perm_add_scope,
+        "add_rse": perm_add_rse,
+        "update_rse": perm_update_rse,
+        "add_protocol": perm_add_protocol,
+        "del_protocol": perm_del_protocol,
+        "update_protocol": perm_update_protocol,
+        "add_qos_policy": perm_add_qos_policy,
+        "delete_qos_policy": perm_delete_qos_policy,
+        "declare_bad_file_replicas": perm_declare_bad_file_replicas,
+        "declare_suspicious_file_replicas": perm_declare_suspicious_file_replicas,
+        "add_replicas": perm_add_replicas,
+        "delete_replicas": perm_delete_replicas,
+        "skip_availability_check": perm_skip_availability_check,
+        "update_replicas_states": perm_update_replicas_states,
+        "add_rse_attribute": perm_add_rse_attribute,
+        "del_rse_attribute": perm_del_rse_attribute,
+        "del_rse": perm_del_rse,
+        "del_rule": perm_del_rule,
+        "update_rule": perm_update_rule,
+        "approve_rule": perm_approve_rule,
+        "update_subscription": perm_update_subscription,
+        "reduce_rule": perm_reduce_rule,
+        "move_rule": perm_move_rule,
+        "get_auth_token_user_pass": perm_get_auth_token_user_pass,
+        "get_auth_token_gss": perm_get_auth_token_gss,
+        "get_auth_token_x509": perm_get_auth_token_x509,
+        "get_auth_token_saml": perm_get_auth_token_saml,
+        "add_account_identity": perm_add_account_identity,
+        "add_did": perm_add_did,
+        "add_dids": perm_add_dids,
+        "attach_dids": perm_attach_dids,
+        "detach_dids": perm_detach_dids,
+        "attach_dids_to_dids": perm_attach_dids_to_dids,
+        "create_did_sample": perm_create_did_sample,
+        "set_metadata": perm_set_metadata,
+        "set_metadata_bulk": perm_set_metadata_bulk,
+        "set_status": perm_set_status,
+        "queue_requests": perm_queue_requests,
+        "set_rse_usage": perm_set_rse_usage,
+        "set_rse_limits": perm_set_rse_limits,
+        "list_requests": perm_list_requests,
+        "list_requests_history": perm_list_requests_history,
+        "get_request_by_did": perm_get_request_by_did,
+        "get_request_history_by_did": perm_get_request_history_by_did,
+        "cancel_request": perm_cancel_request,
+        "get_next": perm_get_next,
+        "set_local_account_limit": perm_set_local_account_limit,
+        "set_global_account_limit": perm_set_global_account_limit,
+        "delete_local_account_limit": perm_delete_local_account_limit,
+        "delete_global_account_limit": perm_delete_global_account_limit,
+        "config_sections": perm_config,
+        "config_add_section": perm_config,
+        "config_has_section": perm_config,
+        "config_options": perm_config,
+        "config_has_option": perm_config,
+        "config_get": perm_config,
+        "config_items": perm_config,
+        "config_set": perm_config,
+        "config_remove_section": perm_config,
+        "config_remove_option": perm_config,
+        "get_local_account_usage": perm_get_local_account_usage,
+        "get_global_account_usage": perm_get_global_account_usage,
+        "add_attribute": perm_add_account_attribute,
+        "del_attribute": perm_del_account_attribute,
+        "list_heartbeats": perm_list_heartbeats,
+        "resurrect": perm_resurrect,
+        "update_lifetime_exceptions": perm_update_lifetime_exceptions,
+        "get_auth_token_ssh": perm_get_auth_token_ssh,
+        "get_signed_url": perm_get_signed_url,
+        "add_bad_pfns": perm_add_bad_pfns,
+        "del_account_identity": perm_del_account_identity,
+        "del_identity": perm_del_identity,
+        "remove_did_from_followed": perm_remove_did_from_followed,
+        "remove_dids_from_followed": perm_remove_dids_from_followed,
+        "export": perm_export,
+    }
+
+    return perm.get(action, perm_default)(issuer=issuer, kwargs=kwargs, session=session)
+
+
+def bench_dispatch():
+    # root is decided without any database access and add_protocol invalidates
+    # no caches, so only the dispatch is measured
+    root = InternalAccount("root")
+    for name, function in [
+        ("dispatch table built per call", has_permission_baseline),
+        ("module-level dispatch table", permission.has_permission),
+    ]:
+        seconds = timeit.timeit(
+            lambda function=function: function(root, "add_protocol", {}),
+            number=N_CALLS,
+        )
+        report(name, seconds)
+
+
+def bench_stats():
+    root = InternalAccount("root")
+    stats = permission.PERMISSION_STATS
+    for name, sample_rate in [
+        ("permission stats disabled", 0.0),
+        ("permission stats, 1% sampled", 0.01),
+        ("permission stats, all sampled", 1.0),
+    ]:
+        stats.configure(sample_rate)
+        seconds = timeit.timeit(
+            lambda: permission.has_permission(root, "add_protocol", {}),
+            number=N_CALLS,
+        )
+        report(name, seconds)
+    stats.configure(0.0)
+
+
+def perm_add_replicas_chain(issuer, kwargs, *, session=None):
+    """perm_add_replicas as before, with a chain of endswith checks."""
+    return (
+        str(kwargs.get("rse", "")).endswith("SCRATCHDISK")
+        or str(kwargs.get("rse", "")).endswith("USERDISK")
+        or str(kwargs.get("rse", "")).endswith("MOCK")
+        or str(kwargs.get("rse", "")).endswith("LOCALGROUPDISK")
+        or permission._is_root(issuer)
+        or permission.is_admin(issuer, session=session)
+    )
+
+
+def bench_add_replicas(n_files=1000):
+    # only the suffix checks, root and matching RSEs need no database access
+    user = InternalAccount("alice")
+    root = InternalAccount("root")
+    for name, issuer, rse in [
+        ("add_replicas, first suffix", user, "CTAO-SCRATCHDISK"),
+        ("add_replicas, last suffix", user, "CTAO-LOCALGROUPDISK"),
+        ("add_replicas, no suffix (root)", root, "CTAO-DISK"),
+    ]:
+        kwargs = {"rse": rse}
+        for variant, function in [
+            ("chain", perm_add_replicas_chain),
+            ("tuple", permission.perm_add_replicas),
+        ]:
+            seconds = timeit.timeit(
+                lambda function=function, issuer=issuer, kwargs=kwargs: function(
+                    issuer, kwargs
+                ),
+                number=N_CALLS,
+            )
+            report(f"{name}, {variant}", seconds)
+
+    kwargs_list = [{"rse": f"SITE{i % 10}-USERDISK"} for i in range(n_files)]
+    n_repeat = N_CALLS // n_files
+    for name, function in [
+        (
+            "add_replicas, per call",
+            lambda: [permission.perm_add_replicas(user, kw) for kw in kwargs_list],
+        ),
+        (
+            "add_replicas, bulk",
+            lambda: permission.perm_add_replicas_bulk(user, kwargs_list),
+        ),
+    ]:
+        seconds = timeit.timeit(function, number=n_repeat)
+        report(name, seconds, n=n_repeat * n_files)
+
+
+def sqlite_session():
+    """Session of an in-memory SQLite database with the rucio tables."""
+    import sqlalchemy as sa
+    from rucio.db.sqla import models
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+
+    engine = sa.create_engine("sqlite://", poolclass=StaticPool)
+    models.register_models(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(models.VO(vo="def", description="Default VO", email="N/A"))
+    return session
+
+
+def sqlite_topology(n_rses=500, countries=("de", "fr", "it", "es", "nl")):
+    """In-memory SQLite database with RSEs in several countries and tiers."""
+    from rucio.core.account import add_account, add_account_attribute
+    from rucio.core.rse import add_rse, add_rse_attribute
+    from rucio.db.sqla.constants import AccountType
+
+    session = sqlite_session()
+    admin = InternalAccount("country")
+    add_account(admin, AccountType.USER, "country@example.org", session=session)
+    for country in countries:
+        add_account_attribute(admin, f"country-{country}", "admin", session=session)
+
+    for i in range(n_rses):
+        rse_id = add_rse(f"RSE-{i:04d}", vo="def", session=session)
+        add_rse_attribute(
+            rse_id, "country", countries[i % len(countries)], session=session
+        )
+        add_rse_attribute(rse_id, "tier", 1 if i < 20 else 2, session=session)
+    session.flush()
+    return session, admin
+
+
+def resolve_countries_per_rse(issuer, rse_expression, *, session=None):
+    """The country lookup as before, one query per RSE."""
+    return {
+        list_rse_attributes(rse_id=rse["id"], session=session).get(RseAttr.COUNTRY)
+        for rse in parse_expression(
+            rse_expression, filter_={"vo": issuer.vo}, session=session
+        )
+    }
+
+
+def bench_global_account_limit(n_calls=20):
+    session, admin = sqlite_topology()
+    kwargs = {"account": admin, "rse_expression": "tier=2", "bytes": 1}
+    resolve = permission._resolve_rse_countries
+
+    for name, resolver, cache_size, expression_cache_size in [
+        ("global limit, query per RSE", resolve_countries_per_rse, 0, 0),
+        ("global limit, bulk query", resolve, 0, 0),
+        ("global limit, bulk query + cache", resolve, 1000, 0),
+        ("global limit, + expression cache", resolve, 1000, 100),
+    ]:
+        rses.RSE_COUNTRY_CACHE.configure(maxsize=cache_size, ttl=300)
+        rses.RSE_EXPRESSION_CACHE.configure(maxsize=expression_cache_size, ttl=30)
+        permission._resolve_rse_countries = resolver
+        try:
+            assert permission.has_permission(
+                admin, "set_global_account_limit", kwargs, session=session
+            )
+            seconds = timeit.timeit(
+                lambda: permission.has_permission(
+                    admin, "set_global_account_limit", kwargs, session=session
+                ),
+                number=n_calls,
+            )
+        finally:
+            permission._resolve_rse_countries = resolve
+        print(f"{name:<40s} {1e3 * seconds / n_calls:8.2f} ms / call (480 RSEs)")
+    rses.RSE_COUNTRY_CACHE.configure(maxsize=0, ttl=300)
+    rses.RSE_EXPRESSION_CACHE.configure(maxsize=0, ttl=30)
+
+
+def bench_token_burst(n_requests=10_000, n_dns=300, seed=0):
+    """x509 token requests of pilots at the start of a production campaign."""
+    import random
+
+    from rucio.core.account import add_account
+    from rucio.core.identity import add_account_identity
+    from rucio.db.sqla.constants import AccountType, IdentityType
+
+    session = sqlite_session()
+    account = InternalAccount("pilot")
+    add_account(account, AccountType.SERVICE, "pilot@example.org", session=session)
+    dns = [f"/DC=org/DC=ctao/OU=pilots/CN=pilot-{i:03d}" for i in range(n_dns)]
+    for dn in dns:
+        add_account_identity(
+            dn, IdentityType.X509, account, "pilot@example.org", session=session
+        )
+    session.flush()
+
+    # a few percent of the requests use DNs which are not mapped
+    rng = random.Random(seed)
+    requests = [
+        {"account": account, "dn": rng.choice(dns) if rng.random() < 0.97 else "/CN=x"}
+        for _ in range(n_requests)
+    ]
+
+    for name, cache_size, negative_ttl in [
+        ("token burst, no cache", 0, 0),
+        ("token burst, cache", 1000, 0),
+        ("token burst, cache + negative cache", 1000, 10),
+    ]:
+        identities.IDENTITY_CACHE.configure(maxsize=cache_size, ttl=60)
+        identities.NEGATIVE_IDENTITY_CACHE.configure(
+            maxsize=cache_size, ttl=negative_ttl
+        )
+        seconds = timeit.timeit(
+            lambda: [
+                permission.has_permission(
+                    account, "get_auth_token_x509", kwargs, session=session
+                )
+                for kwargs in requests
+            ],
+            number=1,
+        )
+        print(
+            f"{name:<40s} {1e3 * seconds:8.1f} ms / {n_requests} requests ({n_dns} DNs)"
+        )
+    identities.IDENTITY_CACHE.configure(maxsize=0, ttl=60)
+    identities.NEGATIVE_IDENTITY_CACHE.configure(maxsize=0, ttl=0)
+
+
+def bench_lifetime_exceptions(n_exceptions=500):
+    """Approval of many lifetime model exceptions by root."""
+    import uuid
+
+    from rucio.common.types import InternalScope
+    from rucio.db.sqla import models
+    from rucio.db.sqla.constants import DIDType, LifetimeExceptionsState
+
+    session = sqlite_session()
+    ids = [uuid.uuid4().hex for _ in range(n_exceptions)]
+    for i, exception_id in enumerate(ids):
+        session.add(
+            models.LifetimeException(
+                id=exception_id,
+                scope=InternalScope("user"),
+                name=f"file-{i}",
+                did_type=DIDType.FILE,
+                account=InternalAccount("alice"),
+                state=LifetimeExceptionsState.WAITING,
+            )
+        )
+    session.flush()
+
+    root = InternalAccount("root")
+    kwargs_list = [{"exception_id": id_, "vo": "def"} for id_ in ids]
+    cache = lifetime_exceptions.LIFETIME_EXCEPTION_CACHE
+    for name, function, cache_size in [
+        (
+            "lifetime exceptions, per call",
+            lambda: [
+                permission.has_permission(
+                    root, "update_lifetime_exceptions", kwargs, session=session
+                )
+                for kwargs in kwargs_list
+            ],
+            0,
+        ),
+        (
+            "lifetime exceptions, bulk",
+            lambda: permission.perm_update_lifetime_exceptions_bulk(
+                root, kwargs_list, session=session
+            ),
+            0,
+        ),
+        (
+            "lifetime exceptions, bulk + cached",
+            lambda: permission.perm_update_lifetime_exceptions_bulk(
+                root, kwargs_list, session=session
+            ),
+            10_000,
+        ),
+    ]:
+        cache.configure(maxsize=cache_size, ttl=math.inf)
+        assert all(function())
+        seconds = timeit.timeit(function, number=5)
+        print(f"{name:<40s} {1e3 * seconds / 5:8.2f} ms / {n_exceptions} approvals")
+    cache.configure(maxsize=10_000, ttl=math.inf)
+
+
+if __name__ == "__main__":
+    bench_dispatch()
+    bench_stats()
+    bench_add_replicas()
+    bench_global_account_limit()
+    bench_token_burst()
+    bench_lifetime_exceptions()
@@ -0,0 +1,43 @@
+"""
+Benchmarks for the schema module of the policy package.
+
+Run as::
+
+    python benchmarks/bench_schema.py
+"""
+
+import re
+import timeit
+
+from dirac_rucio_policy.schema import SCOPE_NAME_REGEXP, split_scope_names
+
+N_URLS = 10_000
+
+
+def make_urls(n=N_URLS):
+    return [
+        f"dl0/ctao.org/dl0/telescope/TEL001/events/2024/06/17/run{i:06d}.fits.fz"
+        for i in range(n)
+    ]
+
+
+def split_scope_names_re(urls):
+    """re.match with the pattern string per url, as rucio's parse_scope_name."""
+    return [re.match(SCOPE_NAME_REGEXP, "/" + url).group(1, 2) for url in urls]
+
+
+def bench_split_scope_names(urls):
+    assert split_scope_names(urls) == split_scope_names_re(urls)
+    print(f"{len(urls):,d} scope/name url segments")
+    for label, function in [
+        ("re.match per url", split_scope_names_re),
+        ("split_scope_names", split_scope_names),
+    ]:
+        seconds = min(
+            timeit.repeat(lambda function=function: function(urls), number=1, repeat=5)
+        )
+        print(f"  {label:<28s} {1e9 * seconds / len(urls):8.0f} ns / url")
+
+
+if __name__ == "__main__":
+    bench_split_scope_names(make_urls())
@@ -1,4 +1,4 @@
-from .algorithms import extract_scope_dirac, lfn2pfn_dirac
+from .algorithms import extract_scope_dirac, lfn2pfn_dirac, lfn2pfn_dirac_hash
 
 __version__ = "0.2.0"
 
@@ -15,6 +15,7 @@ def get_algorithms():
     return {
         "lfn2pfn": {
             "dirac": lfn2pfn_dirac,
+            "dirac_hash": lfn2pfn_dirac_hash,
         },
         "scope": {
             "dirac": extract_scope_dirac,
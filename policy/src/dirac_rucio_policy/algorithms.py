@@ -1,32 +1,292 @@
-from collections.abc import Sequence
-from typing import Optional
+import hashlib
+import re
+from collections.abc import Collection, Sequence
+from functools import cache
+from typing import NamedTuple, Optional
+
+from . import config
 
 __all__ = [
+    "InvalidDIDsError",
+    "ScopeRule",
+    "ScopeRules",
     "extract_scope_dirac",
+    "extract_scopes_dirac",
+    "get_scope_rules",
     "lfn2pfn_dirac",
+    "lfn2pfn_dirac_hash",
+    "pfn2lfn_dirac_hash",
 ]
 
+# leading slashes, VO, slashes, then the scope is the next path component
+_SCOPE_PATTERN = re.compile(r"/+[^/]+/+([^/]+)")
+
+
+class ScopeRule(NamedTuple):
+    """Where to find the scope below an LFN prefix."""
+
+    #: position of the scope component below the prefix, 1 is directly below
+    depth: int = 1
+    #: if not None, only these scopes are allowed below the prefix
+    allowed: Optional[frozenset[str]] = None
+
+
+_DEFAULT_RULE = ScopeRule()
+
+
+class _Node:
+    __slots__ = ("children", "rule")
+
+    def __init__(self):
+        self.children: dict[str, _Node] = {}
+        self.rule: Optional[ScopeRule] = None
+
+
+class ScopeRules:
+    """Scope extraction rules per LFN prefix, stored in a prefix trie.
+
+    Looking up the rule of an LFN only walks the components of its longest
+    matching prefix, independent of the number of rules.
+    LFNs not matching any prefix use ``/<VO Name>/<scope>/<path>``.
+    """
+
+    def __init__(self, rules: dict[str, ScopeRule]):
+        self._root = _Node()
+        for prefix, rule in rules.items():
+            if rule.depth < 1:
+                raise ValueError(f"Scope depth for {prefix!r} must be >= 1")
+            node = self._root
+            for component in filter(None, prefix.split("/")):
+                node = node.children.setdefault(component, _Node())
+            node.rule = rule
+
+    @classmethod
+    def parse(cls, text: str) -> "ScopeRules":
+        """Parse rules of the form ``<prefix>=<depth>[:<scope>|<scope>...], ...``.
+
+        E.g. ``/ctao.org=1, /vo.example.org/user=2:alice|bob``.
+        """
+        rules = {}
+        for entry in text.split(","):
+            entry = entry.strip()
+            if not entry:
+                continue
+            prefix, sep, spec = entry.partition("=")
+            if not sep or not prefix.startswith("/"):
+                raise ValueError(f"Invalid scope rule {entry!r}")
+            depth, _, allowed = spec.partition(":")
+            rules[prefix.strip()] = ScopeRule(
+                depth=int(depth),
+                allowed=frozenset(allowed.split("|")) if allowed else None,
+            )
+        return cls(rules)
+
+    def match(self, did: str) -> tuple[ScopeRule, int]:
+        """Find the rule of the longest prefix of ``did``.
+
+        :returns: The rule and the position in ``did`` where the prefix ends.
+        """
+        node = self._root
+        rule = prefix_end = first_end = None
+        n = len(did)
+        pos = 0
+        while pos < n:
+            end = did.find("/", pos)
+            if end == -1:
+                end = n
+            if end > pos:
+                if first_end is None:
+                    first_end = end
+                node = node.children.get(did[pos:end])
+                if node is None:
+                    break
+                if node.rule is not None:
+                    rule, prefix_end = node.rule, end
+            pos = end + 1
+
+        if rule is None:
+            # default: the VO is the prefix
+            return _DEFAULT_RULE, n if first_end is None else first_end
+        return rule, prefix_end
+
+    def extract(self, did: str) -> str:
+        """Extract the scope of ``did``, ``"root"`` if it has no scope component."""
+        rule, pos = self.match(did)
+        depth = 0
+        n = len(did)
+        while pos < n:
+            end = did.find("/", pos)
+            if end == -1:
+                end = n
+            if end > pos:
+                depth += 1
+                if depth == rule.depth:
+                    scope = did[pos:end]
+                    if rule.allowed is not None and scope not in rule.allowed:
+                        raise ValueError(
+                            f"Scope {scope!r} of DID {did!r} is not allowed,"
+                            f" must be one of {sorted(rule.allowed)}"
+                        )
+                    return scope
+            pos = end + 1
+        return "root"
+
+
+@cache
+def get_scope_rules() -> Optional[ScopeRules]:
+    """The scope rules from the ``extract_scope_rules`` policy option, if any."""
+    text = config.get_str("extract_scope_rules", "")
+    if not text.strip():
+        return None
+    return ScopeRules.parse(text)
+
+
+def _schema_mismatch(did: str) -> str:
+    return f"DID {did!r} does not match expected schema: /<VO Name>/<scope>/<path>."
+
+
+def _unknown_scope(scope: str, did: str) -> str:
+    return f"Scope {scope!r} of DID {did!r} does not exist."
 
-def extract_scope_dirac(did: str, scopes: Optional[Sequence[str]]) -> Sequence[str]:
+
+def extract_scope_dirac(did: str, scopes: Optional[Collection[str]]) -> Sequence[str]:
     """Scope extraction algorithm for DIRAC.
 
-    Assumes LFNs of the form ``/<VO Name>/<scope>/<path>``.
+    Assumes LFNs of the form ``/<VO Name>/<scope>/<path>``, unless other
+    rules are configured using the ``extract_scope_rules`` policy option.
+    If ``scopes`` is given, the extracted scope must be one of them.
     """
-    msg = f"DID {did!r} does not match expected schema: /<VO Name>/<scope>/<path>."
     if not did.startswith("/"):
-        raise ValueError(msg)
+        raise ValueError(_schema_mismatch(did))
+
+    rules = get_scope_rules()
+    if rules is not None:
+        scope = rules.extract(did)
+    else:
+        # only scan the did up to the end of the scope, not the full path
+        match = _SCOPE_PATTERN.match(did)
+
+        # if no "scope" is in the did, e.g. it's just the vo or another path
+        # we return the special "root" scope. Needed as the DIRAC integration
+        # needs a container to exist with DID /<VO> and that should belong to
+        # the scope "root" owned by the admin user.
+        scope = "root" if match is None else match.group(1)
+
+    if scopes is not None and scope not in scopes:
+        raise ValueError(_unknown_scope(scope, did))
+
+    return scope, did
+
+
+class InvalidDIDsError(ValueError):
+    """Raised by `extract_scopes_dirac` with the indices of all invalid DIDs."""
+
+    def __init__(self, reasons: dict[int, str]):
+        #: why each invalid DID was rejected, by index
+        self.reasons = reasons
+        self.indices = list(reasons)
+        examples = "; ".join(reasons[i] for i in self.indices[:3])
+        super().__init__(
+            f"{len(reasons)} invalid DIDs, e.g. {examples}"
+            f" Invalid indices: {self.indices}"
+        )
+
+
+def extract_scopes_dirac(
+    dids: Sequence[str], scopes: Optional[Collection[str]] = None
+) -> tuple[Sequence[str], Sequence[str]]:
+    """Bulk version of `extract_scope_dirac`.
+
+    Processes all DIDs in one pass, ``dids`` can be any sequence of strings,
+    including a numpy string array, in which case numpy arrays are returned.
+    If ``scopes`` is given, each extracted scope must be one of them.
+
+    :returns: The scopes and names of the DIDs.
+    :raises InvalidDIDsError: listing all DIDs not matching the schema,
+        rejected by the scope rules or with a scope not in ``scopes``.
+    """
+    rules = get_scope_rules()
+    match = _SCOPE_PATTERN.match
+    # one hash set for all DIDs instead of scanning ``scopes`` for each DID
+    known = None if scopes is None else frozenset(scopes)
+    extracted = []
+    reasons = {}
+    for index, did in enumerate(dids):
+        if not did.startswith("/"):
+            reasons[index] = _schema_mismatch(str(did))
+            continue
+        if rules is not None:
+            try:
+                scope = rules.extract(str(did))
+            except ValueError as e:
+                reasons[index] = str(e)
+                continue
+        else:
+            m = match(did)
+            scope = "root" if m is None else m.group(1)
+        if known is not None and scope not in known:
+            reasons[index] = _unknown_scope(scope, str(did))
+            continue
+        extracted.append(scope)
 
-    components = [comp for comp in did.split("/") if comp != ""]
+    if reasons:
+        raise InvalidDIDsError(reasons)
 
-    # if no "scope" is in the did, e.g. it's just the vo or another path
-    # we return the special "root" scope. Needed as the DIRAC integration
-    # needs a container to exist with DID /<VO> and that should belong to
-    # the scope "root" owned by the admin user.
-    if len(components) < 2:
-        return "root", did
+    if hasattr(dids, "dtype"):
+        import numpy as np
 
-    return components[1], did
+        return np.array(extracted, dtype=str), dids
+
+    return extracted, list(dids)
 
 
 def lfn2pfn_dirac(scope, name, rse, rse_attrs, protocol_attrs):
     return name
+
+
+@cache
+def get_hash_fanout() -> tuple[int, int]:
+    """Depth and width of the hash directories of `lfn2pfn_dirac_hash`.
+
+    Configured by the ``lfn2pfn_hash_depth`` and ``lfn2pfn_hash_width``
+    policy options, defaults to 2 levels of 2 hex characters each.
+    """
+    depth = config.get_int("lfn2pfn_hash_depth", 2)
+    width = config.get_int("lfn2pfn_hash_width", 2)
+    if depth < 1 or not 1 <= width <= 8 or depth * width > 32:
+        raise ValueError(f"Invalid lfn2pfn hash fan-out: depth={depth}, width={width}")
+    return depth, width
+
+
+@cache
+def _hash_slices(depth: int, width: int) -> tuple[slice, ...]:
+    return tuple(slice(i * width, (i + 1) * width) for i in range(depth))
+
+
+def lfn2pfn_dirac_hash(scope, name, rse, rse_attrs, protocol_attrs):
+    """lfn2pfn algorithm spreading the files of a directory over hash directories.
+
+    Inserts directories derived from the md5 hash of the LFN in front of
+    the file name, e.g. ``/<VO>/<scope>/<path>/<file>`` is stored as
+    ``/<VO>/<scope>/<path>/3f/a2/<file>`` with the default fan-out,
+    see `get_hash_fanout`. Use `pfn2lfn_dirac_hash` to get the LFN back.
+    """
+    digest = hashlib.md5(name.encode(), usedforsecurity=False).hexdigest()
+    directory, separator, filename = name.rpartition("/")
+    fanout = [digest[s] for s in _hash_slices(*get_hash_fanout())]
+    path = "/".join([*fanout, filename])
+    # names without a directory stay relative, so they can be told apart
+    # from names in the root directory
+    return f"{directory}/{path}" if separator else path
+
+
+def pfn2lfn_dirac_hash(path: str) -> str:
+    """Inverse of `lfn2pfn_dirac_hash`, remove the hash directories from a path."""
+    depth, _ = get_hash_fanout()
+    parts = path.rsplit("/", depth + 1)
+    if len(parts) == depth + 1:
+        # relative name without a directory
+        return parts[-1]
+    if len(parts) != depth + 2:
+        raise ValueError(f"Path {path!r} does not contain {depth} hash directories")
+    return f"{parts[0]}/{parts[-1]}"
@@ -0,0 +1,217 @@
+"""
+CTAO rucio policy: caching helpers used by the permission checks.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Iterable, Mapping
+from typing import TYPE_CHECKING, Any
+from weakref import WeakKeyDictionary
+
+if TYPE_CHECKING:
+    from sqlalchemy.orm import Session
+
+__all__ = [
+    "SessionCache",
+    "TTLCache",
+]
+
+
+class SessionCache:
+    """
+    Cache values for the lifetime of a database session.
+
+    Rucio opens one session per API request, so this effectively is a
+    request-scoped cache. Entries are dropped together with the session
+    object they are attached to. Without a session, nothing is cached.
+    """
+
+    def __init__(self):
+        self._data: WeakKeyDictionary[Any, dict[Hashable, Any]] = WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        session: "Session | None",
+        key: Hashable,
+        compute: Callable[[], Any],
+    ) -> Any:
+        """
+        Return the value cached for ``key`` in ``session``.
+
+        :param session: The DB session the value is bound to.
+        :param key: The cache key inside the session.
+        :param compute: Callable producing the value on a cache miss.
+        :returns: The cached or newly computed value.
+        """
+        if session is None:
+            return compute()
+
+        with self._lock:
+            values = self._data.setdefault(session, {})
+            if key in values:
+                return values[key]
+
+        value = compute()
+        with self._lock:
+            values[key] = value
+        return value
+
+    def contains(self, session: "Session | None", key: Hashable) -> bool:
+        """Check if a value for ``key`` is cached in ``session``."""
+        if session is None:
+            return False
+        with self._lock:
+            return key in self._data.get(session, {})
+
+    def invalidate(self, session: "Session | None", key: Hashable) -> None:
+        """Remove ``key`` from the values cached for ``session``."""
+        if session is None:
+            return
+        with self._lock:
+            self._data.get(session, {}).pop(key, None)
+
+    def clear(self) -> None:
+        """Remove all cached values."""
+        with self._lock:
+            self._data.clear()
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache with a bounded size and expiring entries.
+
+    Entries are evicted in least-recently-used order once ``maxsize`` is
+    reached and are recomputed once they are older than ``ttl`` seconds.
+    A cache with ``maxsize`` or ``ttl`` of zero is disabled and stores nothing.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        timer: Callable[[], float] = time.monotonic,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.ttl > 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def configure(self, maxsize: int, ttl: float) -> None:
+        """Change size and ttl of the cache, removing all entries."""
+        with self._lock:
+            self.maxsize = maxsize
+            self.ttl = ttl
+            self._data.clear()
+
+    def get(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Return the value cached for ``key``.
+
+        :param key: The cache key.
+        :param compute: Callable producing the value on a cache miss.
+        :returns: The cached or newly computed value.
+        """
+        if not self.enabled:
+            return compute()
+
+        now = self.timer()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > now:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = compute()
+        self.set(key, value)
+        return value
+
+    def lookup(self, key: Hashable, default: Any = None) -> Any:
+        """Return the value cached for ``key`` or ``default``, without computing it."""
+        if not self.enabled:
+            return default
+
+        now = self.timer()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > now:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        return default
+
+    def get_many(
+        self,
+        keys: Iterable[Hashable],
+        compute: Callable[[list[Hashable]], Mapping[Hashable, Any]],
+    ) -> dict[Hashable, Any]:
+        """
+        Return the values cached for ``keys``, computing all misses at once.
+
+        :param keys: The cache keys.
+        :param compute: Callable producing the values for a list of missing
+            keys in a single call. Keys missing from its result are stored as None.
+        :returns: Mapping of each key to its cached or newly computed value.
+        """
+        keys = list(dict.fromkeys(keys))
+        if not self.enabled:
+            computed = compute(keys) if keys else {}
+            return {key: computed.get(key) for key in keys}
+
+        now = self.timer()
+        values = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is not None and entry[0] > now:
+                    self._data.move_to_end(key)
+                    values[key] = entry[1]
+                else:
+                    missing.append(key)
+            self.hits += len(values)
+            self.misses += len(missing)
+
+        if missing:
+            computed = compute(missing)
+            for key in missing:
+                value = values[key] = computed.get(key)
+                self.set(key, value)
+        return {key: values[key] for key in keys}
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store ``value`` for ``key``, evicting the oldest entries if needed."""
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._data[key] = (self.timer() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Remove ``key`` from the cache."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove all entries and reset the hit / miss counters."""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
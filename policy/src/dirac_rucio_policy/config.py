@@ -0,0 +1,47 @@
+"""
+CTAO rucio policy: options read from the ``[policy]`` section of the rucio config.
+"""
+
+from rucio.common.config import config_get, config_get_float, config_get_int
+
+__all__ = [
+    "SECTION",
+    "get_float",
+    "get_int",
+    "get_str",
+]
+
+SECTION = "policy"
+
+
+def get_int(option: str, default: int) -> int:
+    """Get an integer option from the policy section of the rucio config."""
+    return config_get_int(
+        SECTION,
+        option,
+        raise_exception=False,
+        default=default,
+        check_config_table=False,
+    )
+
+
+def get_float(option: str, default: float) -> float:
+    """Get a floating point option from the policy section of the rucio config."""
+    return config_get_float(
+        SECTION,
+        option,
+        raise_exception=False,
+        default=default,
+        check_config_table=False,
+    )
+
+
+def get_str(option: str, default: str) -> str:
+    """Get a string option from the policy section of the rucio config."""
+    return config_get(
+        SECTION,
+        option,
+        raise_exception=False,
+        default=default,
+        check_config_table=False,
+    )
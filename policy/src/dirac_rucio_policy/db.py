@@ -0,0 +1,39 @@
+"""
+CTAO rucio policy: helpers for the database queries of the policy package.
+"""
+
+from collections.abc import Iterable, Iterator
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from sqlalchemy import Row, Select
+    from sqlalchemy.orm import Session
+
+__all__ = [
+    "MAX_IN_CLAUSE",
+    "execute_in_chunks",
+]
+
+#: Oracle does not allow more than 1000 elements in an IN clause
+MAX_IN_CLAUSE = 1000
+
+
+def execute_in_chunks(
+    stmt: "Select", column: Any, values: Iterable[Any], *, session: "Session"
+) -> Iterator["Row"]:
+    """
+    Execute a query restricted to many values of a column.
+
+    The values are split into chunks of at most `MAX_IN_CLAUSE` values,
+    each queried with an ``IN`` clause.
+
+    :param stmt: The query to restrict.
+    :param column: The column whose value must be one of ``values``.
+    :param values: The values of the column to query.
+    :param session: The DB session to use
+    :returns: The rows of all chunks
+    """
+    values = list(values)
+    for start in range(0, len(values), MAX_IN_CLAUSE):
+        chunk = values[start : start + MAX_IN_CLAUSE]
+        yield from session.execute(stmt.where(column.in_(chunk)))
@@ -0,0 +1,80 @@
+"""
+CTAO rucio policy: caching of the identity to account mappings.
+
+Checking if an identity, e.g. the DN of a certificate, is mapped to an
+account is the only database access of the token permission checks.
+Existing mappings can be cached process-wide, configured by the
+``identity_cache_size`` and ``identity_cache_ttl`` options of the
+``[policy]`` section of the rucio config. Missing mappings are only
+cached if ``identity_negative_cache_ttl`` is set as well.
+The caches are disabled by default.
+"""
+
+from typing import TYPE_CHECKING
+
+from rucio.core.identity import exist_identity_account
+
+from . import config
+from .cache import TTLCache
+
+if TYPE_CHECKING:
+    from rucio.common.types import InternalAccount
+    from rucio.db.sqla.constants import IdentityType
+    from sqlalchemy.orm import Session
+
+__all__ = [
+    "IDENTITY_CACHE",
+    "NEGATIVE_IDENTITY_CACHE",
+    "identity_has_account",
+    "invalidate_identities",
+]
+
+#: process-wide cache of existing (identity, type, account) mappings
+IDENTITY_CACHE = TTLCache(
+    maxsize=config.get_int("identity_cache_size", 0),
+    ttl=config.get_float("identity_cache_ttl", 60.0),
+)
+
+#: process-wide cache of missing (identity, type, account) mappings
+NEGATIVE_IDENTITY_CACHE = TTLCache(
+    maxsize=config.get_int("identity_cache_size", 0),
+    ttl=config.get_float("identity_negative_cache_ttl", 0.0),
+)
+
+
+def identity_has_account(
+    identity: str,
+    type_: "IdentityType",
+    account: "InternalAccount",
+    *,
+    session: "Session | None" = None,
+) -> bool:
+    """
+    Check if an identity is mapped to an account.
+
+    :param identity: The user identity, e.g. the DN.
+    :param type_: The type of the identity.
+    :param account: The account.
+    :param session: The DB session to use
+    :returns: True if the identity is mapped to the account, otherwise False
+    """
+    key = (identity, type_, account)
+    if IDENTITY_CACHE.lookup(key, False):
+        return True
+    if NEGATIVE_IDENTITY_CACHE.lookup(key, False):
+        return False
+
+    exists = exist_identity_account(
+        identity=identity, type_=type_, account=account, session=session
+    )
+    if exists:
+        IDENTITY_CACHE.set(key, True)
+    else:
+        NEGATIVE_IDENTITY_CACHE.set(key, True)
+    return exists
+
+
+def invalidate_identities() -> None:
+    """Remove all cached mappings, e.g. when identities are added or removed."""
+    IDENTITY_CACHE.clear()
+    NEGATIVE_IDENTITY_CACHE.clear()
@@ -0,0 +1,97 @@
+"""
+CTAO rucio policy: lookup of the VOs of lifetime model exceptions.
+
+The VOs of many exceptions are resolved with a single query. Since the
+DIDs of an exception never change after its creation, they are cached
+without expiry, up to ``lifetime_exception_cache_size`` exceptions
+(option of the ``[policy]`` section of the rucio config, default 10000).
+"""
+
+import math
+import uuid
+from collections.abc import Iterable
+from typing import TYPE_CHECKING, Optional
+
+from rucio.db.sqla import models
+from rucio.db.sqla.session import read_session
+from sqlalchemy import select
+
+from . import config
+from .cache import TTLCache
+from .db import execute_in_chunks
+
+if TYPE_CHECKING:
+    from sqlalchemy.orm import Session
+
+__all__ = [
+    "LIFETIME_EXCEPTION_CACHE",
+    "exception_vos",
+    "query_exception_vos",
+]
+
+#: process-wide cache of the VOs of the DIDs per exception id
+LIFETIME_EXCEPTION_CACHE = TTLCache(
+    maxsize=config.get_int("lifetime_exception_cache_size", 10_000),
+    ttl=math.inf,
+)
+
+
+def _normalize_id(exception_id) -> Optional[str]:
+    # the ids as returned by the database, 32 lowercase hex digits
+    try:
+        return uuid.UUID(str(exception_id)).hex
+    except ValueError:
+        return None
+
+
+@read_session
+def query_exception_vos(
+    exception_ids: Iterable[str], *, session: "Session"
+) -> dict[str, frozenset[str]]:
+    """
+    Query the VOs of the DIDs of many lifetime exceptions at once.
+
+    :param exception_ids: The ids of the exceptions, as 32 lowercase hex digits.
+    :param session: The DB session to use
+    :returns: Mapping of exception id to VOs, unknown exceptions are missing
+    """
+    vos: dict[str, set[str]] = {}
+    stmt = select(models.LifetimeException.id, models.LifetimeException.scope)
+    for exception_id, scope in execute_in_chunks(
+        stmt, models.LifetimeException.id, exception_ids, session=session
+    ):
+        vos.setdefault(exception_id, set()).add(scope.vo)
+    return {exception_id: frozenset(vo) for exception_id, vo in vos.items()}
+
+
+def exception_vos(
+    exception_ids: Iterable[str], *, session: "Session | None" = None
+) -> list[frozenset[str]]:
+    """
+    Get the VOs of the DIDs of many lifetime exceptions.
+
+    Exceptions not found in the cache are resolved with a single query.
+    Unknown exceptions are not cached, they might not be visible yet.
+
+    :param exception_ids: The ids of the exceptions.
+    :param session: The DB session to use
+    :returns: For each exception, the VOs of its DIDs, empty for unknown exceptions
+    """
+    normalized = [_normalize_id(exception_id) for exception_id in exception_ids]
+    vos = {}
+    missing = []
+    for exception_id in dict.fromkeys(normalized):
+        if exception_id is None:
+            continue
+        cached = LIFETIME_EXCEPTION_CACHE.lookup(exception_id)
+        if cached is None:
+            missing.append(exception_id)
+        else:
+            vos[exception_id] = cached
+
+    if missing:
+        found = query_exception_vos(missing, session=session)
+        for exception_id, value in found.items():
+            LIFETIME_EXCEPTION_CACHE.set(exception_id, value)
+        vos.update(found)
+    return [vos.get(exception_id, frozenset()) for exception_id in normalized]
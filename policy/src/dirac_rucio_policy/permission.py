@@ -4,361 +4,202 @@ CTAO rucio policy: permissions.
 Modified from lib/rucio/core/permission/generic.py.
 """
 
+import time
 from typing import TYPE_CHECKING, Any
 
-import rucio.core.scope
 from rucio.common.constants import RseAttr
-from rucio.core.account import has_account_attribute, list_account_attributes
-from rucio.core.identity import exist_identity_account
-from rucio.core.lifetime_exception import list_exceptions
 from rucio.core.rse import list_rse_attributes
-from rucio.core.rse_expression_parser import parse_expression
 from rucio.db.sqla.constants import IdentityType
 
+from . import config, profiling
+from .identities import identity_has_account, invalidate_identities
+from .lifetime_exceptions import exception_vos
+from .privileges import (
+    country_admin_countries,
+    get_privileges,
+    invalidate_privileges,
+    invalidate_scope_owner,
+    is_admin,
+    is_scope_owner,
+)
+from .rses import (
+    invalidate_rse_countries,
+    invalidate_rse_expressions,
+    resolve_rse_expression,
+    rse_countries,
+)
+from .rules import (
+    ADMIN,
+    ALLOW,
+    COUNTRY_ADMIN,
+    DENY,
+    MOCK_SCOPE,
+    OWN_ACCOUNT,
+    ROOT,
+    ROOT_ONLY,
+    ROOT_OR_ADMIN,
+    SCOPE_OWNER,
+    Rule,
+    compile_rule,
+    compile_rules,
+)
+from .stats import PermissionStats
+
 if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+
     from rucio.common.types import InternalAccount
     from sqlalchemy.orm import Session
 
+    PermissionFunction = Callable[..., bool]
 
-def has_permission(
-    issuer: "InternalAccount",
-    action: str,
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account has the specified permission to
-    execute an action with parameters.
-
-    :param issuer: Account identifier which issues the command..
-    :param action:  The action(API call) called by the account.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-    perm = {
-        "add_account": perm_add_account,
-        "del_account": perm_del_account,
-        "update_account": perm_update_account,
-        "add_rule": perm_add_rule,
-        "add_subscription": perm_add_subscription,
-        "add_scope": perm_add_scope,
-        "add_rse": perm_add_rse,
-        "update_rse": perm_update_rse,
-        "add_protocol": perm_add_protocol,
-        "del_protocol": perm_del_protocol,
-        "update_protocol": perm_update_protocol,
-        "add_qos_policy": perm_add_qos_policy,
-        "delete_qos_policy": perm_delete_qos_policy,
-        "declare_bad_file_replicas": perm_declare_bad_file_replicas,
-        "declare_suspicious_file_replicas": perm_declare_suspicious_file_replicas,
-        "add_replicas": perm_add_replicas,
-        "delete_replicas": perm_delete_replicas,
-        "skip_availability_check": perm_skip_availability_check,
-        "update_replicas_states": perm_update_replicas_states,
-        "add_rse_attribute": perm_add_rse_attribute,
-        "del_rse_attribute": perm_del_rse_attribute,
-        "del_rse": perm_del_rse,
-        "del_rule": perm_del_rule,
-        "update_rule": perm_update_rule,
-        "approve_rule": perm_approve_rule,
-        "update_subscription": perm_update_subscription,
-        "reduce_rule": perm_reduce_rule,
-        "move_rule": perm_move_rule,
-        "get_auth_token_user_pass": perm_get_auth_token_user_pass,
-        "get_auth_token_gss": perm_get_auth_token_gss,
-        "get_auth_token_x509": perm_get_auth_token_x509,
-        "get_auth_token_saml": perm_get_auth_token_saml,
-        "add_account_identity": perm_add_account_identity,
-        "add_did": perm_add_did,
-        "add_dids": perm_add_dids,
-        "attach_dids": perm_attach_dids,
-        "detach_dids": perm_detach_dids,
-        "attach_dids_to_dids": perm_attach_dids_to_dids,
-        "create_did_sample": perm_create_did_sample,
-        "set_metadata": perm_set_metadata,
-        "set_metadata_bulk": perm_set_metadata_bulk,
-        "set_status": perm_set_status,
-        "queue_requests": perm_queue_requests,
-        "set_rse_usage": perm_set_rse_usage,
-        "set_rse_limits": perm_set_rse_limits,
-        "list_requests": perm_list_requests,
-        "list_requests_history": perm_list_requests_history,
-        "get_request_by_did": perm_get_request_by_did,
-        "get_request_history_by_did": perm_get_request_history_by_did,
-        "cancel_request": perm_cancel_request,
-        "get_next": perm_get_next,
-        "set_local_account_limit": perm_set_local_account_limit,
-        "set_global_account_limit": perm_set_global_account_limit,
-        "delete_local_account_limit": perm_delete_local_account_limit,
-        "delete_global_account_limit": perm_delete_global_account_limit,
-        "config_sections": perm_config,
-        "config_add_section": perm_config,
-        "config_has_section": perm_config,
-        "config_options": perm_config,
-        "config_has_option": perm_config,
-        "config_get": perm_config,
-        "config_items": perm_config,
-        "config_set": perm_config,
-        "config_remove_section": perm_config,
-        "config_remove_option": perm_config,
-        "get_local_account_usage": perm_get_local_account_usage,
-        "get_global_account_usage": perm_get_global_account_usage,
-        "add_attribute": perm_add_account_attribute,
-        "del_attribute": perm_del_account_attribute,
-        "list_heartbeats": perm_list_heartbeats,
-        "resurrect": perm_resurrect,
-        "update_lifetime_exceptions": perm_update_lifetime_exceptions,
-        "get_auth_token_ssh": perm_get_auth_token_ssh,
-        "get_signed_url": perm_get_signed_url,
-        "add_bad_pfns": perm_add_bad_pfns,
-        "del_account_identity": perm_del_account_identity,
-        "del_identity": perm_del_identity,
-        "remove_did_from_followed": perm_remove_did_from_followed,
-        "remove_dids_from_followed": perm_remove_dids_from_followed,
-        "export": perm_export,
-    }
-
-    return perm.get(action, perm_default)(issuer=issuer, kwargs=kwargs, session=session)
-
-
-def _is_root(issuer) -> bool:
-    return issuer.external == "root"
-
-
-def perm_default(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Default permission.
+#: statistics of the permission decisions, disabled by default
+PERMISSION_STATS = PermissionStats(
+    sample_rate=config.get_float("permission_stats_sample_rate", 0.0)
+)
 
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-    return _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    )
 
+def _parse_suffixes(text: str) -> tuple[str, ...]:
+    return tuple(suffix.strip() for suffix in text.split(",") if suffix.strip())
 
-def perm_add_rse(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can add a RSE.
 
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-    return _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
+#: RSE name suffixes of RSEs accepting replicas from every account
+ADD_REPLICAS_RSE_SUFFIXES = _parse_suffixes(
+    config.get_str(
+        "add_replicas_rse_suffixes", "SCRATCHDISK,USERDISK,MOCK,LOCALGROUPDISK"
     )
+)
 
 
-def perm_update_rse(
+def has_permission(
     issuer: "InternalAccount",
+    action: str,
     kwargs: dict[str, Any],
     *,
     session: "Session | None" = None,
 ) -> bool:
     """
-    Checks if an account can update a RSE.
+    Checks if an account has the specified permission to
+    execute an action with parameters.
 
-    :param issuer: Account identifier which issues the command.
+    :param issuer: Account identifier which issues the command..
+    :param action:  The action(API call) called by the account.
     :param kwargs: List of arguments for the action.
     :param session: The DB session to use
     :returns: True if account is allowed, otherwise False
     """
-    return _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    )
-
+    check = PERMISSIONS.get(action, perm_default)
+    if PERMISSION_STATS.enabled or profiling.active is not None:
+        allowed = _instrumented(check, issuer, action, kwargs, session)
+    else:
+        allowed = check(issuer=issuer, kwargs=kwargs, session=session)
 
-def perm_add_rule(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can add a replication rule.
+    # the action is about to change cached state
+    invalidate = _INVALIDATIONS.get(action)
+    if allowed and invalidate is not None:
+        invalidate(kwargs, session=session)
 
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-    if kwargs["account"] == issuer and not kwargs["locked"]:
-        return True
-    if _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    ):
-        return True
-    return False
+    return allowed
 
 
-def perm_add_subscription(
+def _instrumented(
+    check: "PermissionFunction",
     issuer: "InternalAccount",
+    action: str,
     kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
+    session: "Session | None",
 ) -> bool:
-    """
-    Checks if an account can add a subscription.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-    if _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    ):
-        return True
-    return False
+    """Run a permission check, recording statistics and queries if enabled."""
+    profiler = profiling.active
+    sampled = PERMISSION_STATS.enabled and PERMISSION_STATS.sample()
+    start = time.perf_counter()
+    if profiler is not None:
+        with profiler.track(action, session):
+            allowed = check(issuer=issuer, kwargs=kwargs, session=session)
+    else:
+        allowed = check(issuer=issuer, kwargs=kwargs, session=session)
+    if sampled:
+        PERMISSION_STATS.record(action, allowed, time.perf_counter() - start)
+    return allowed
 
 
-def perm_add_rse_attribute(
+def has_permissions_bulk(
     issuer: "InternalAccount",
-    kwargs: dict[str, Any],
+    requests: "Iterable[tuple[str, dict[str, Any]]]",
     *,
     session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can add a RSE attribute.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
+) -> list[bool]:
     """
-    if _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    ):
-        return True
-    return False
-
+    Checks the permissions of an account for many actions at once.
 
-def perm_del_rse_attribute(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can delete a RSE attribute.
+    The privileges of the issuer, including all scopes it owns, are
+    resolved once up front and shared by all checks in the session.
 
     :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
+    :param requests: Pairs of action (API call) and its arguments.
     :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
+    :returns: For each request, True if account is allowed, otherwise False
     """
-    if _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    ):
-        return True
-    return False
+    if not _is_root(issuer):
+        get_privileges(issuer, session=session)
 
+    return [
+        has_permission(issuer, action, kwargs, session=session)
+        for action, kwargs in requests
+    ]
 
-def perm_del_rse(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can delete a RSE.
 
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
+def register_permission(
+    action: str, function: "PermissionFunction | None" = None
+) -> Any:
     """
-    return _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    )
+    Register the permission check for an action, replacing the current one.
 
+    Can be used directly or as decorator, e.g. in site-specific policy code::
 
-def perm_add_account(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can add an account.
+        @register_permission("add_rse")
+        def perm_add_rse(issuer, kwargs, *, session=None):
+            return issuer.external == "root"
 
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
+    :param action: The action (API call) to register the function for.
+    :param function: The permission check, signature as the ``perm_*`` functions.
+    :returns: The function, or a decorator if no function was given.
     """
-    return _is_root(issuer)
+    if function is None:
 
+        def decorator(function: "PermissionFunction") -> "PermissionFunction":
+            PERMISSIONS[action] = function
+            return function
 
-def perm_del_account(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can del an account.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-    return _is_root(issuer)
+        return decorator
 
+    PERMISSIONS[action] = function
+    return function
 
-def perm_update_account(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can update an account.
 
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-    return _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    )
+def _is_root(issuer) -> bool:
+    return issuer.external == "root"
 
 
-def perm_add_scope(
+def perm_add_rule(
     issuer: "InternalAccount",
     kwargs: dict[str, Any],
     *,
     session: "Session | None" = None,
 ) -> bool:
     """
-    Checks if an account can add a scop to a account.
+    Checks if an account can add a replication rule.
 
     :param issuer: Account identifier which issues the command.
     :param kwargs: List of arguments for the action.
     :param session: The DB session to use
     :returns: True if account is allowed, otherwise False
     """
-    return _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    )
+    if kwargs["account"] == issuer and not kwargs["locked"]:
+        return True
+    if _is_root(issuer) or is_admin(issuer, session=session):
+        return True
+    return False
 
 
 def perm_get_auth_token_user_pass(
@@ -375,7 +216,7 @@ def perm_get_auth_token_user_pass(
     :param session: The DB session to use
     :returns: True if account is allowed, otherwise False
     """
-    if exist_identity_account(
+    if identity_has_account(
         identity=kwargs["username"],
         type_=IdentityType.USERPASS,
         account=kwargs["account"],
@@ -399,7 +240,7 @@ def perm_get_auth_token_gss(
     :param session: The DB session to use
     :returns: True if account is allowed, otherwise False
     """
-    if exist_identity_account(
+    if identity_has_account(
         identity=kwargs["gsscred"],
         type_=IdentityType.GSS,
         account=kwargs["account"],
@@ -423,7 +264,7 @@ def perm_get_auth_token_x509(
     :param session: The DB session to use
     :returns: True if account is allowed, otherwise False
     """
-    if exist_identity_account(
+    if identity_has_account(
         identity=kwargs["dn"],
         type_=IdentityType.X509,
         account=kwargs["account"],
@@ -447,7 +288,7 @@ def perm_get_auth_token_saml(
     :param session: The DB session to use
     :returns: True if account is allowed, otherwise False
     """
-    if exist_identity_account(
+    if identity_has_account(
         identity=kwargs["saml_nameid"],
         type_=IdentityType.SAML,
         account=kwargs["account"],
@@ -457,46 +298,6 @@ def perm_get_auth_token_saml(
     return False
 
 
-def perm_add_account_identity(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can add an identity to an account.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-
-    return _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    )
-
-
-def perm_del_account_identity(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can delete an identity to an account.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-
-    return _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    )
-
-
 def perm_del_identity(
     issuer: "InternalAccount", kwargs, *, session: "Session | None" = None
 ) -> bool:
@@ -527,19 +328,15 @@ def perm_add_did(
     :returns: True if account is allowed, otherwise False
     """
     # Check the accounts of the issued rules
-    if not _is_root(issuer) and not has_account_attribute(
-        account=issuer, key="admin", session=session
-    ):
+    if not _is_root(issuer) and not is_admin(issuer, session=session):
         for rule in kwargs.get("rules", []):
             if rule["account"] != issuer:
                 return False
 
     return (
         _is_root(issuer)
-        or has_account_attribute(account=issuer, key="admin", session=session)
-        or rucio.core.scope.is_scope_owner(
-            scope=kwargs["scope"], account=issuer, session=session
-        )
+        or is_admin(issuer, session=session)
+        or is_scope_owner(kwargs["scope"], issuer, session=session)
         or kwargs["scope"].external == "mock"
     )
 
@@ -559,41 +356,13 @@ def perm_add_dids(
     :returns: True if account is allowed, otherwise False
     """
     # Check the accounts of the issued rules
-    if not _is_root(issuer) and not has_account_attribute(
-        account=issuer, key="admin", session=session
-    ):
+    if not _is_root(issuer) and not is_admin(issuer, session=session):
         for did in kwargs["dids"]:
             for rule in did.get("rules", []):
                 if rule["account"] != issuer:
                     return False
 
-    return _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    )
-
-
-def perm_attach_dids(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can append an data identifier to the other data identifier.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-    return (
-        _is_root(issuer)
-        or has_account_attribute(account=issuer, key="admin", session=session)
-        or rucio.core.scope.is_scope_owner(
-            scope=kwargs["scope"], account=issuer, session=session
-        )
-        or kwargs["scope"].external == "mock"
-    )
+    return _is_root(issuer) or is_admin(issuer, session=session)
 
 
 def perm_attach_dids_to_dids(
@@ -610,655 +379,108 @@ def perm_attach_dids_to_dids(
     :param session: The DB session to use
     :returns: True if account is allowed, otherwise False
     """
-    if _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    ):
+    if _is_root(issuer) or is_admin(issuer, session=session):
         return True
     else:
         attachments = kwargs["attachments"]
         scopes = [did["scope"] for did in attachments]
         scopes = list(set(scopes))
         for scope in scopes:
-            if not rucio.core.scope.is_scope_owner(scope, issuer, session=session):
+            if not is_scope_owner(scope, issuer, session=session):
                 return False
         return True
 
 
-def perm_create_did_sample(
+def perm_set_status(
     issuer: "InternalAccount",
     kwargs: dict[str, Any],
     *,
     session: "Session | None" = None,
 ) -> bool:
     """
-    Checks if an account can create a sample of a data identifier collection.
+    Checks if an account can set status on an data identifier.
 
     :param issuer: Account identifier which issues the command.
     :param kwargs: List of arguments for the action.
     :param session: The DB session to use
     :returns: True if account is allowed, otherwise False
     """
+    if kwargs.get("open", False):
+        if not _is_root(issuer) and not is_admin(issuer, session=session):
+            return False
+
     return (
         _is_root(issuer)
-        or has_account_attribute(account=issuer, key="admin", session=session)
-        or rucio.core.scope.is_scope_owner(
-            scope=kwargs["scope"], account=issuer, session=session
-        )
-        or kwargs["scope"].external == "mock"
+        or is_admin(issuer, session=session)
+        or is_scope_owner(kwargs["scope"], issuer, session=session)
     )
 
 
-def perm_del_rule(
+def perm_add_replicas(
     issuer: "InternalAccount",
     kwargs: dict[str, Any],
     *,
     session: "Session | None" = None,
 ) -> bool:
     """
-    Checks if an issuer can delete a replication rule.
+    Checks if an account can add replicas.
 
     :param issuer: Account identifier which issues the command.
     :param kwargs: List of arguments for the action.
     :param session: The DB session to use
-    :returns: True if account is allowed to call the API call, otherwise False
+    :returns: True if account is allowed, otherwise False
     """
-    if _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    ):
-        return True
-    return False
+    return (
+        str(kwargs.get("rse", "")).endswith(ADD_REPLICAS_RSE_SUFFIXES)
+        or _is_root(issuer)
+        or is_admin(issuer, session=session)
+    )
 
 
-def perm_update_rule(
+def perm_add_replicas_bulk(
     issuer: "InternalAccount",
-    kwargs: dict[str, Any],
+    kwargs_list: "Iterable[dict[str, Any]]",
     *,
     session: "Session | None" = None,
-) -> bool:
+) -> list[bool]:
     """
-    Checks if an issuer can update a replication rule.
+    Checks if an account can add replicas, for many ``add_replicas`` calls at once.
+
+    The privileges of the issuer are only resolved once, and only if
+    one of the RSEs does not accept replicas from every account.
 
     :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
+    :param kwargs_list: The arguments of each add_replicas call.
     :param session: The DB session to use
-    :returns: True if account is allowed to call the API call, otherwise False
+    :returns: For each call, True if account is allowed, otherwise False
     """
-    if _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    ):
-        return True
-    return False
+    allowed = [
+        str(kwargs.get("rse", "")).endswith(ADD_REPLICAS_RSE_SUFFIXES)
+        for kwargs in kwargs_list
+    ]
+    if not all(allowed) and (_is_root(issuer) or is_admin(issuer, session=session)):
+        return [True] * len(allowed)
+    return allowed
 
 
-def perm_approve_rule(
+def perm_set_local_account_limit(
     issuer: "InternalAccount",
     kwargs: dict[str, Any],
     *,
     session: "Session | None" = None,
 ) -> bool:
     """
-    Checks if an issuer can approve a replication rule.
+    Checks if an account can set an account limit.
 
-    :param issuer: Account identifier which issues the command.
+    :param account: Account identifier which issues the command.
     :param kwargs: List of arguments for the action.
     :param session: The DB session to use
-    :returns: True if account is allowed to call the API call, otherwise False
+    :returns: True if account is allowed, otherwise False
     """
-    if _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    ):
-        return True
-    return False
-
-
-def perm_reduce_rule(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an issuer can reduce a replication rule.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed to call the API call, otherwise False
-    """
-    if _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    ):
-        return True
-    return False
-
-
-def perm_move_rule(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an issuer can move a replication rule.
-
-    :param issuer:   Account identifier which issues the command.
-    :param kwargs:   List of arguments for the action.
-    :param session: The DB session to use
-    :returns:        True if account is allowed to call the API call, otherwise False
-    """
-    if _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    ):
-        return True
-    return False
-
-
-def perm_update_subscription(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can update a subscription.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-    if _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    ):
-        return True
-
-    return False
-
-
-def perm_detach_dids(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can detach an data identifier from the other data identifier.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-    return perm_attach_dids(issuer, kwargs, session=session)
-
-
-def perm_set_metadata_bulk(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can set a metadata on a data identifier.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-    return (
-        _is_root(issuer)
-        or has_account_attribute(account=issuer, key="admin", session=session)
-        or rucio.core.scope.is_scope_owner(
-            scope=kwargs["scope"], account=issuer, session=session
-        )
-    )
-
-
-def perm_set_metadata(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can set a metadata on a data identifier.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-    return (
-        _is_root(issuer)
-        or has_account_attribute(account=issuer, key="admin", session=session)
-        or rucio.core.scope.is_scope_owner(
-            scope=kwargs["scope"], account=issuer, session=session
-        )
-    )
-
-
-def perm_set_status(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can set status on an data identifier.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-    if kwargs.get("open", False):
-        if not _is_root(issuer) and not has_account_attribute(
-            account=issuer, key="admin", session=session
-        ):
-            return False
-
-    return (
-        _is_root(issuer)
-        or has_account_attribute(account=issuer, key="admin", session=session)
-        or rucio.core.scope.is_scope_owner(
-            scope=kwargs["scope"], account=issuer, session=session
-        )
-    )
-
-
-def perm_add_protocol(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can add a protocol to an RSE.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-    return _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    )
-
-
-def perm_del_protocol(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can delete protocols from an RSE.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-    return _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    )
-
-
-def perm_update_protocol(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can update protocols of an RSE.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-    return _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    )
-
-
-def perm_add_qos_policy(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can add QoS policies to an RSE.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-    return _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    )
-
-
-def perm_delete_qos_policy(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can delete QoS policies from an RSE.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-    return _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    )
-
-
-def perm_declare_bad_file_replicas(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can declare bad file replicas.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-    return _is_root(issuer)
-
-
-def perm_declare_suspicious_file_replicas(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can declare suspicious file replicas.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-    return True
-
-
-def perm_add_replicas(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can add replicas.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-    return (
-        str(kwargs.get("rse", "")).endswith("SCRATCHDISK")
-        or str(kwargs.get("rse", "")).endswith("USERDISK")
-        or str(kwargs.get("rse", "")).endswith("MOCK")
-        or str(kwargs.get("rse", "")).endswith("LOCALGROUPDISK")
-        or _is_root(issuer)
-        or has_account_attribute(account=issuer, key="admin", session=session)
-    )
-
-
-def perm_skip_availability_check(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can skip the availabity check to add/delete file replicas.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-    return _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    )
-
-
-def perm_delete_replicas(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can delete replicas.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-    return False
-
-
-def perm_update_replicas_states(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can delete replicas.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-    return _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    )
-
-
-def perm_queue_requests(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can submit transfer or deletion requests on destination RSEs for data identifiers.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-    return _is_root(issuer)
-
-
-def perm_list_requests(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can list requests.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-    return _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    )
-
-
-def perm_list_requests_history(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can list historical requests.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-    return _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    )
-
-
-def perm_get_request_by_did(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can get a request by DID.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-    return True
-
-
-def perm_get_request_history_by_did(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can get a historical request by DID.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-    return _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    )
-
-
-def perm_cancel_request(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can cancel a request.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-    return _is_root(issuer)
-
-
-def perm_get_next(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can retrieve the next request matching the request type and state.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-    return _is_root(issuer)
-
-
-def perm_set_rse_usage(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can set RSE usage information.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed to call the API call, otherwise False
-    """
-    return _is_root(issuer)
-
-
-def perm_set_rse_limits(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can set RSE limits.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed to call the API call, otherwise False
-    """
-    return _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    )
-
-
-def perm_set_local_account_limit(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can set an account limit.
-
-    :param account: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-    if _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    ):
+    if _is_root(issuer) or is_admin(issuer, session=session):
         return True
     # Check if user is a country admin
-    admin_in_country = []
-    for kv in list_account_attributes(account=issuer, session=session):
-        if kv["key"].startswith("country-") and kv["value"] == "admin":
-            admin_in_country.append(kv["key"].partition("-")[2])
+    admin_in_country = country_admin_countries(issuer, session=session)
     if (
         admin_in_country
         and list_rse_attributes(rse_id=kwargs["rse_id"], session=session).get(
@@ -1270,6 +492,17 @@ def perm_set_local_account_limit(
     return False
 
 
+def _resolve_rse_countries(
+    issuer: "InternalAccount",
+    rse_expression: str,
+    *,
+    session: "Session | None" = None,
+) -> set["str | None"]:
+    """Countries of all RSEs matching an expression, resolved with a single query."""
+    rse_ids = resolve_rse_expression(rse_expression, issuer.vo, session=session)
+    return set(rse_countries(rse_ids, session=session).values())
+
+
 def perm_set_global_account_limit(
     issuer: "InternalAccount",
     kwargs: dict[str, Any],
@@ -1284,21 +517,13 @@ def perm_set_global_account_limit(
     :param session: The DB session to use
     :returns: True if account is allowed, otherwise False
     """
-    if _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    ):
+    if _is_root(issuer) or is_admin(issuer, session=session):
         return True
     # Check if user is a country admin
-    admin_in_country = set()
-    for kv in list_account_attributes(account=issuer, session=session):
-        if kv["key"].startswith("country-") and kv["value"] == "admin":
-            admin_in_country.add(kv["key"].partition("-")[2])
-    resolved_rse_countries = {
-        list_rse_attributes(rse_id=rse["rse_id"], session=session).get(RseAttr.COUNTRY)
-        for rse in parse_expression(
-            kwargs["rse_expression"], filter_={"vo": issuer.vo}, session=session
-        )
-    }
+    admin_in_country = country_admin_countries(issuer, session=session)
+    resolved_rse_countries = _resolve_rse_countries(
+        issuer, kwargs["rse_expression"], session=session
+    )
     if resolved_rse_countries.issubset(admin_in_country):
         return True
     return False
@@ -1318,15 +543,10 @@ def perm_delete_local_account_limit(
     :param session: The DB session to use
     :returns: True if account is allowed, otherwise False
     """
-    if _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    ):
+    if _is_root(issuer) or is_admin(issuer, session=session):
         return True
     # Check if user is a country admin
-    admin_in_country = []
-    for kv in list_account_attributes(account=issuer, session=session):
-        if kv["key"].startswith("country-") and kv["value"] == "admin":
-            admin_in_country.append(kv["key"].partition("-")[2])
+    admin_in_country = country_admin_countries(issuer, session=session)
     if (
         admin_in_country
         and list_rse_attributes(rse_id=kwargs["rse_id"], session=session).get(
@@ -1352,175 +572,19 @@ def perm_delete_global_account_limit(
     :param session: The DB session to use
     :returns: True if account is allowed, otherwise False
     """
-    if _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    ):
+    if _is_root(issuer) or is_admin(issuer, session=session):
         return True
     # Check if user is a country admin
-    admin_in_country = set()
-    for kv in list_account_attributes(account=issuer, session=session):
-        if kv["key"].startswith("country-") and kv["value"] == "admin":
-            admin_in_country.add(kv["key"].partition("-")[2])
+    admin_in_country = country_admin_countries(issuer, session=session)
     if admin_in_country:
-        resolved_rse_countries = {
-            list_rse_attributes(rse_id=rse["rse_id"], session=session).get(
-                RseAttr.COUNTRY
-            )
-            for rse in parse_expression(
-                kwargs["rse_expression"], filter_={"vo": issuer.vo}, session=session
-            )
-        }
+        resolved_rse_countries = _resolve_rse_countries(
+            issuer, kwargs["rse_expression"], session=session
+        )
         if resolved_rse_countries.issubset(admin_in_country):
             return True
     return False
 
 
-def perm_config(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can read/write the configuration.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed to call the API call, otherwise False
-    """
-    return _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    )
-
-
-def perm_get_local_account_usage(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can get the account usage of an account.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-    if (
-        _is_root(issuer)
-        or has_account_attribute(account=issuer, key="admin", session=session)
-        or kwargs.get("account") == issuer
-    ):
-        return True
-    # Check if user is a country admin
-    for kv in list_account_attributes(account=issuer, session=session):
-        if kv["key"].startswith("country-") and kv["value"] == "admin":
-            return True
-    return False
-
-
-def perm_get_global_account_usage(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can get the account usage of an account.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-    if (
-        _is_root(issuer)
-        or has_account_attribute(account=issuer, key="admin", session=session)
-        or kwargs.get("account") == issuer
-    ):
-        return True
-
-    # Check if user is a country admin for all involved countries
-    for kv in list_account_attributes(account=issuer, session=session):
-        if kv["key"].startswith("country-") and kv["value"] == "admin":
-            return True
-    return False
-
-
-def perm_add_account_attribute(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can add attributes to accounts.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed to call the API call, otherwise False
-    """
-    return _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    )
-
-
-def perm_del_account_attribute(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can add attributes to accounts.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed to call the API call, otherwise False
-    """
-    return perm_add_account_attribute(issuer, kwargs, session=session)
-
-
-def perm_list_heartbeats(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can list heartbeats.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed to call the API call, otherwise False
-    """
-    return _is_root(issuer)
-
-
-def perm_resurrect(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can resurrect DIDS.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed to call the API call, otherwise False
-    """
-    return _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    )
-
-
 def perm_update_lifetime_exceptions(
     issuer: "InternalAccount",
     kwargs: dict[str, Any],
@@ -1534,122 +598,176 @@ def perm_update_lifetime_exceptions(
     :param session: The DB session to use
     :returns: True if account is allowed to call the API call, otherwise False
     """
-    if kwargs["vo"] is not None:
-        exceptions = next(
-            list_exceptions(
-                exception_id=kwargs["exception_id"], states=False, session=session
-            )
-        )
-        if exceptions["scope"].vo != kwargs["vo"]:
-            return False
-    return _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    )
-
-
-def perm_get_auth_token_ssh(
-    issuer: "InternalAccount", kwargs: dict, *, session: "Session | None" = None
-) -> bool:
-    """
-    Checks if an account can request an ssh token.
-
-    :param issuer: Account identifier which issues the command.
-    :param session: The DB session to use
-    :returns: True if account is allowed to call the API call, otherwise False
-    """
-    return True
-
-
-def perm_get_signed_url(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can request a signed URL.
-
-    :param issuer: Account identifier which issues the command.
-    :param session: The DB session to use
-    :returns: True if account is allowed to call the API call, otherwise False
-    """
-    return _is_root(issuer)
-
-
-def perm_add_bad_pfns(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can declare bad PFNs.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-    return _is_root(issuer)
-
-
-def perm_remove_did_from_followed(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can remove did from followed table.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-    return (
-        _is_root(issuer)
-        or has_account_attribute(account=issuer, key="admin", session=session)
-        or kwargs["account"] == issuer
-        or kwargs["scope"].external == "mock"
-    )
+    return perm_update_lifetime_exceptions_bulk(issuer, [kwargs], session=session)[0]
 
 
-def perm_remove_dids_from_followed(
+def perm_update_lifetime_exceptions_bulk(
     issuer: "InternalAccount",
-    kwargs: dict[str, Any],
+    kwargs_list: "Iterable[dict[str, Any]]",
     *,
     session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can bulk remove dids from followed table.
-
-    :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
-    :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
+) -> list[bool]:
     """
-    if _is_root(issuer) or has_account_attribute(
-        account=issuer, key="admin", session=session
-    ):
-        return True
-    if not kwargs["account"] == issuer:
-        return False
-    return True
+    Checks if an account can approve/reject many Lifetime Model exceptions at once.
 
-
-def perm_export(
-    issuer: "InternalAccount",
-    kwargs: dict[str, Any],
-    *,
-    session: "Session | None" = None,
-) -> bool:
-    """
-    Checks if an account can export the RSE info.
+    The VOs of all exceptions are resolved with a single query.
 
     :param issuer: Account identifier which issues the command.
-    :param kwargs: List of arguments for the action.
+    :param kwargs_list: The arguments of each update_lifetime_exceptions call.
     :param session: The DB session to use
-    :returns: True if account is allowed, otherwise False
-    """
-    return _is_root(issuer)
+    :returns: For each call, True if account is allowed, otherwise False
+    """
+    kwargs_list = list(kwargs_list)
+    if not (_is_root(issuer) or is_admin(issuer, session=session)):
+        return [False] * len(kwargs_list)
+
+    checked = [kwargs for kwargs in kwargs_list if kwargs["vo"] is not None]
+    vos = iter(
+        exception_vos([kwargs["exception_id"] for kwargs in checked], session=session)
+    )
+    # all DIDs of the exception must be in the VO of the request
+    return [
+        kwargs["vo"] is None or next(vos) == {kwargs["vo"]} for kwargs in kwargs_list
+    ]
+
+
+def _account_attributes_changed(
+    kwargs: dict[str, Any], *, session: "Session | None" = None
+) -> None:
+    invalidate_privileges(kwargs["account"], session=session)
+
+
+def _scope_added(kwargs: dict[str, Any], *, session: "Session | None" = None) -> None:
+    invalidate_scope_owner(kwargs["scope"], kwargs["account"], session=session)
+
+
+def _rses_changed(kwargs: dict[str, Any], *, session: "Session | None" = None) -> None:
+    invalidate_rse_expressions()
+
+
+def _rse_attribute_changed(
+    kwargs: dict[str, Any], *, session: "Session | None" = None
+) -> None:
+    invalidate_rse_expressions()
+    if kwargs["key"] == RseAttr.COUNTRY:
+        invalidate_rse_countries(kwargs.get("rse_id"))
+
+
+def _rse_deleted(kwargs: dict[str, Any], *, session: "Session | None" = None) -> None:
+    invalidate_rse_expressions()
+    invalidate_rse_countries(kwargs.get("rse_id"))
+
+
+def _identities_changed(
+    kwargs: dict[str, Any], *, session: "Session | None" = None
+) -> None:
+    invalidate_identities()
+
+
+#: cache invalidations to run when an action changing cached state is allowed
+_INVALIDATIONS = {
+    "add_attribute": _account_attributes_changed,
+    "del_attribute": _account_attributes_changed,
+    "add_scope": _scope_added,
+    "add_account_identity": _identities_changed,
+    "del_account_identity": _identities_changed,
+    "del_identity": _identities_changed,
+    "del_account": _identities_changed,
+    "add_rse": _rses_changed,
+    "update_rse": _rses_changed,
+    "del_rse": _rse_deleted,
+    "add_rse_attribute": _rse_attribute_changed,
+    "del_rse_attribute": _rse_attribute_changed,
+}
+
+#: permissions depending only on a few predicates, see `dirac_rucio_policy.rules`
+RULES: dict[str, Rule] = {
+    "add_account": ROOT_ONLY,
+    "del_account": ROOT_ONLY,
+    "update_account": ROOT_OR_ADMIN,
+    "add_subscription": ROOT_OR_ADMIN,
+    "add_scope": ROOT_OR_ADMIN,
+    "add_rse": ROOT_OR_ADMIN,
+    "update_rse": ROOT_OR_ADMIN,
+    "add_protocol": ROOT_OR_ADMIN,
+    "del_protocol": ROOT_OR_ADMIN,
+    "update_protocol": ROOT_OR_ADMIN,
+    "add_qos_policy": ROOT_OR_ADMIN,
+    "delete_qos_policy": ROOT_OR_ADMIN,
+    "declare_bad_file_replicas": ROOT_ONLY,
+    "declare_suspicious_file_replicas": ALLOW,
+    "delete_replicas": DENY,
+    "skip_availability_check": ROOT_OR_ADMIN,
+    "update_replicas_states": ROOT_OR_ADMIN,
+    "add_rse_attribute": ROOT_OR_ADMIN,
+    "del_rse_attribute": ROOT_OR_ADMIN,
+    "del_rse": ROOT_OR_ADMIN,
+    "del_rule": ROOT_OR_ADMIN,
+    "update_rule": ROOT_OR_ADMIN,
+    "approve_rule": ROOT_OR_ADMIN,
+    "update_subscription": ROOT_OR_ADMIN,
+    "reduce_rule": ROOT_OR_ADMIN,
+    "move_rule": ROOT_OR_ADMIN,
+    "add_account_identity": ROOT_OR_ADMIN,
+    "attach_dids": Rule((ROOT, ADMIN, SCOPE_OWNER, MOCK_SCOPE)),
+    "detach_dids": Rule((ROOT, ADMIN, SCOPE_OWNER, MOCK_SCOPE)),
+    "create_did_sample": Rule((ROOT, ADMIN, SCOPE_OWNER, MOCK_SCOPE)),
+    "set_metadata": Rule((ROOT, ADMIN, SCOPE_OWNER)),
+    "set_metadata_bulk": Rule((ROOT, ADMIN, SCOPE_OWNER)),
+    "queue_requests": ROOT_ONLY,
+    "set_rse_usage": ROOT_ONLY,
+    "set_rse_limits": ROOT_OR_ADMIN,
+    "list_requests": ROOT_OR_ADMIN,
+    "list_requests_history": ROOT_OR_ADMIN,
+    "get_request_by_did": ALLOW,
+    "get_request_history_by_did": ROOT_OR_ADMIN,
+    "cancel_request": ROOT_ONLY,
+    "get_next": ROOT_ONLY,
+    "config_sections": ROOT_OR_ADMIN,
+    "config_add_section": ROOT_OR_ADMIN,
+    "config_has_section": ROOT_OR_ADMIN,
+    "config_options": ROOT_OR_ADMIN,
+    "config_has_option": ROOT_OR_ADMIN,
+    "config_get": ROOT_OR_ADMIN,
+    "config_items": ROOT_OR_ADMIN,
+    "config_set": ROOT_OR_ADMIN,
+    "config_remove_section": ROOT_OR_ADMIN,
+    "config_remove_option": ROOT_OR_ADMIN,
+    "get_local_account_usage": Rule((ROOT, ADMIN, OWN_ACCOUNT, COUNTRY_ADMIN)),
+    "get_global_account_usage": Rule((ROOT, ADMIN, OWN_ACCOUNT, COUNTRY_ADMIN)),
+    "add_attribute": ROOT_OR_ADMIN,
+    "del_attribute": ROOT_OR_ADMIN,
+    "list_heartbeats": ROOT_ONLY,
+    "resurrect": ROOT_OR_ADMIN,
+    "get_auth_token_ssh": ALLOW,
+    "get_signed_url": ROOT_ONLY,
+    "add_bad_pfns": ROOT_ONLY,
+    "del_account_identity": ROOT_OR_ADMIN,
+    "remove_did_from_followed": Rule((ROOT, ADMIN, OWN_ACCOUNT, MOCK_SCOPE)),
+    "remove_dids_from_followed": Rule((ROOT, ADMIN, OWN_ACCOUNT)),
+    "export": ROOT_ONLY,
+}
+
+#: permission of actions without a registered check
+perm_default = compile_rule(ROOT_OR_ADMIN, "perm_default")
+
+#: mapping of action (API call) to the function checking its permission
+PERMISSIONS: dict[str, "PermissionFunction"] = {
+    **compile_rules(RULES),
+    "add_rule": perm_add_rule,
+    "add_replicas": perm_add_replicas,
+    "get_auth_token_user_pass": perm_get_auth_token_user_pass,
+    "get_auth_token_gss": perm_get_auth_token_gss,
+    "get_auth_token_x509": perm_get_auth_token_x509,
+    "get_auth_token_saml": perm_get_auth_token_saml,
+    "add_did": perm_add_did,
+    "add_dids": perm_add_dids,
+    "attach_dids_to_dids": perm_attach_dids_to_dids,
+    "set_status": perm_set_status,
+    "set_local_account_limit": perm_set_local_account_limit,
+    "set_global_account_limit": perm_set_global_account_limit,
+    "delete_local_account_limit": perm_delete_local_account_limit,
+    "delete_global_account_limit": perm_delete_global_account_limit,
+    "update_lifetime_exceptions": perm_update_lifetime_exceptions,
+    "del_identity": perm_del_identity,
+}
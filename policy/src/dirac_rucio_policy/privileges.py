@@ -0,0 +1,283 @@
+"""
+CTAO rucio policy: resolution and caching of the privileges of an issuer.
+
+Account attributes are always cached for the duration of a request.
+Additionally, the resolved privileges and scope ownership lookups can be
+cached process-wide, configured by the ``privilege_cache_size``,
+``privilege_cache_ttl``, ``scope_owner_cache_size`` and
+``scope_owner_cache_ttl`` options of the ``[policy]`` section of the rucio config.
+The process-wide caches are disabled by default.
+"""
+
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+import rucio.core.scope
+from rucio.db.sqla import models
+from rucio.db.sqla.constants import AccountStatus
+from rucio.db.sqla.session import read_session
+from sqlalchemy import select
+
+from . import config
+from .cache import SessionCache, TTLCache
+
+if TYPE_CHECKING:
+    from rucio.common.types import InternalAccount, InternalScope
+    from sqlalchemy.orm import Session
+
+__all__ = [
+    "PRIVILEGE_CACHE",
+    "SCOPE_OWNER_CACHE",
+    "Privileges",
+    "account_attributes",
+    "country_admin_countries",
+    "get_privileges",
+    "invalidate_privileges",
+    "invalidate_scope_owner",
+    "is_account_active",
+    "is_admin",
+    "is_scope_owner",
+    "query_account_attributes",
+    "query_owned_scopes",
+    "resolve_privileges",
+]
+
+
+class Privileges(NamedTuple):
+    """The resolved privileges of an account."""
+
+    root: bool
+    admin: bool
+    #: countries the account is a country admin of
+    countries: frozenset[str]
+    #: scopes owned by the account
+    scopes: frozenset["InternalScope"]
+
+
+#: account attributes of the issuers, cached per DB session / request
+_REQUEST_ATTRIBUTES = SessionCache()
+
+#: resolved privileges of the issuers, cached per DB session / request
+_REQUEST_PRIVILEGES = SessionCache()
+
+#: countries the issuers are country admins of, cached per DB session / request
+_REQUEST_COUNTRIES = SessionCache()
+
+#: process-wide cache of resolved privileges per account
+PRIVILEGE_CACHE = TTLCache(
+    maxsize=config.get_int("privilege_cache_size", 0),
+    ttl=config.get_float("privilege_cache_ttl", 60.0),
+)
+
+#: process-wide cache of scope ownership per (scope, account)
+SCOPE_OWNER_CACHE = TTLCache(
+    maxsize=config.get_int("scope_owner_cache_size", 0),
+    ttl=config.get_float("scope_owner_cache_ttl", 300.0),
+)
+
+
+@read_session
+def query_account_attributes(
+    account: "InternalAccount", *, session: "Session"
+) -> dict[str, Any]:
+    """
+    Query all attributes of an account.
+
+    Like rucio's ``has_account_attribute``, the status of the account is not
+    checked, so e.g. a suspended admin keeps its privileges.
+
+    :param account: The account to query the attributes of.
+    :param session: The DB session to use
+    :returns: Mapping of attribute key to value, empty for unknown accounts
+    """
+    stmt = select(
+        models.AccountAttrAssociation.key,
+        models.AccountAttrAssociation.value,
+    ).where(models.AccountAttrAssociation.account == account)
+    return {key: value for key, value in session.execute(stmt)}
+
+
+@read_session
+def is_account_active(account: "InternalAccount", *, session: "Session") -> bool:
+    """
+    Check if an account exists and is active.
+
+    :param account: The account to check.
+    :param session: The DB session to use
+    :returns: True if the account is active, otherwise False
+    """
+    stmt = select(models.Account.status).where(models.Account.account == account)
+    return session.execute(stmt).scalar() == AccountStatus.ACTIVE
+
+
+@read_session
+def query_owned_scopes(
+    account: "InternalAccount", *, session: "Session"
+) -> frozenset["InternalScope"]:
+    """
+    Query all scopes owned by an account.
+
+    Like rucio's ``is_scope_owner``, the status of the scopes is not checked,
+    unlike ``get_scopes``, which skips deleted scopes.
+
+    :param account: The account to query the scopes of.
+    :param session: The DB session to use
+    :returns: The scopes of the account, empty for unknown accounts
+    """
+    stmt = select(models.Scope.scope).where(models.Scope.account == account)
+    return frozenset(session.execute(stmt).scalars())
+
+
+def account_attributes(
+    issuer: "InternalAccount", *, session: "Session | None" = None
+) -> dict[str, Any]:
+    """
+    Get all attributes of an account with a single query per request.
+
+    :param issuer: Account identifier which issues the command.
+    :param session: The DB session to use
+    :returns: Mapping of attribute key to value
+    """
+    return _REQUEST_ATTRIBUTES.get(
+        session, issuer, lambda: query_account_attributes(issuer, session=session)
+    )
+
+
+def _admin_countries(
+    issuer: "InternalAccount",
+    attributes: dict[str, Any],
+    session: "Session | None",
+) -> frozenset[str]:
+    countries = frozenset(
+        key.partition("-")[2]
+        for key, value in attributes.items()
+        if key.startswith("country-") and value == "admin"
+    )
+    # rucio's list_account_attributes refuses inactive accounts, so only active
+    # country admins have their privileges; only checked for country admins
+    if countries and not is_account_active(issuer, session=session):
+        return frozenset()
+    return countries
+
+
+def resolve_privileges(
+    issuer: "InternalAccount", *, session: "Session | None" = None
+) -> Privileges:
+    """
+    Resolve the privileges of an account from the database.
+
+    :param issuer: Account identifier which issues the command.
+    :param session: The DB session to use
+    :returns: The privileges of the account
+    """
+    attributes = account_attributes(issuer, session=session)
+    return Privileges(
+        root=issuer.external == "root",
+        admin=attributes.get("admin") is not None,
+        countries=_admin_countries(issuer, attributes, session),
+        scopes=query_owned_scopes(issuer, session=session),
+    )
+
+
+def get_privileges(
+    issuer: "InternalAccount", *, session: "Session | None" = None
+) -> Privileges:
+    """
+    Get the privileges of an account.
+
+    The privileges are resolved once per request and are shared across
+    requests if the process-wide cache is enabled.
+
+    :param issuer: Account identifier which issues the command.
+    :param session: The DB session to use
+    :returns: The privileges of the account
+    """
+    return _REQUEST_PRIVILEGES.get(
+        session,
+        issuer,
+        lambda: PRIVILEGE_CACHE.get(
+            issuer, lambda: resolve_privileges(issuer, session=session)
+        ),
+    )
+
+
+def _privileges_resolved(issuer: "InternalAccount", session: "Session | None") -> bool:
+    return PRIVILEGE_CACHE.enabled or _REQUEST_PRIVILEGES.contains(session, issuer)
+
+
+def invalidate_privileges(
+    account: "InternalAccount", *, session: "Session | None" = None
+) -> None:
+    """
+    Drop all cached privileges and attributes of an account.
+
+    :param account: The account whose privileges changed.
+    :param session: The DB session of the request changing the privileges.
+    """
+    PRIVILEGE_CACHE.invalidate(account)
+    _REQUEST_ATTRIBUTES.invalidate(session, account)
+    _REQUEST_COUNTRIES.invalidate(session, account)
+    _REQUEST_PRIVILEGES.invalidate(session, account)
+
+
+def invalidate_scope_owner(
+    scope: "InternalScope",
+    account: "InternalAccount",
+    *,
+    session: "Session | None" = None,
+) -> None:
+    """
+    Drop the cached ownership of a scope, e.g. when it is added.
+
+    :param scope: The scope whose owner changed.
+    :param account: The owner of the scope.
+    :param session: The DB session of the request changing the scope.
+    """
+    SCOPE_OWNER_CACHE.invalidate((scope, account))
+    invalidate_privileges(account, session=session)
+
+
+def is_admin(issuer: "InternalAccount", *, session: "Session | None" = None) -> bool:
+    """Check if the issuer has the admin attribute."""
+    if _privileges_resolved(issuer, session):
+        return get_privileges(issuer, session=session).admin
+    return account_attributes(issuer, session=session).get("admin") is not None
+
+
+def country_admin_countries(
+    issuer: "InternalAccount", *, session: "Session | None" = None
+) -> frozenset[str]:
+    """
+    Get the countries the issuer is a country admin of.
+
+    Resolved once per request, or taken from the cached privileges if available.
+
+    :param issuer: Account identifier which issues the command.
+    :param session: The DB session to use
+    :returns: The countries of all ``country-<country>: admin`` attributes
+    """
+    if _privileges_resolved(issuer, session):
+        return get_privileges(issuer, session=session).countries
+    return _REQUEST_COUNTRIES.get(
+        session,
+        issuer,
+        lambda: _admin_countries(
+            issuer, account_attributes(issuer, session=session), session
+        ),
+    )
+
+
+def is_scope_owner(
+    scope: "InternalScope",
+    issuer: "InternalAccount",
+    *,
+    session: "Session | None" = None,
+) -> bool:
+    """Check if the issuer owns the given scope."""
+    if _privileges_resolved(issuer, session):
+        return scope in get_privileges(issuer, session=session).scopes
+    return SCOPE_OWNER_CACHE.get(
+        (scope, issuer),
+        lambda: rucio.core.scope.is_scope_owner(
+            scope=scope, account=issuer, session=session
+        ),
+    )
@@ -0,0 +1,145 @@
+"""
+CTAO rucio policy: attribution of database queries to permission actions.
+
+While a `QueryProfiler` is active, e.g. using `profile_queries`, every
+``has_permission`` call counts the SQL statements executed on the engine
+of its ``session``::
+
+    with profile_queries() as profiler:
+        has_permission(issuer, "set_global_account_limit", kwargs, session=session)
+    print(profiler.report())
+"""
+
+import contextlib
+import contextvars
+import threading
+from collections import Counter
+from collections.abc import Iterator
+from typing import TYPE_CHECKING, Any, Optional
+
+from sqlalchemy import event
+
+if TYPE_CHECKING:
+    from sqlalchemy.orm import Session
+
+__all__ = [
+    "QueryProfiler",
+    "active",
+    "profile_queries",
+]
+
+#: the profiler used by has_permission, None if profiling is disabled
+active: Optional["QueryProfiler"] = None
+
+#: statements executed in the permission check currently running
+_statements: contextvars.ContextVar[Optional[list[str]]] = contextvars.ContextVar(
+    "statements", default=None
+)
+
+
+class _ActionQueries:
+    __slots__ = ("calls", "max_queries", "statements")
+
+    def __init__(self):
+        self.calls = 0
+        self.max_queries = 0
+        self.statements: Counter[str] = Counter()
+
+
+class QueryProfiler:
+    """Counts the SQL statements executed per permission action."""
+
+    def __init__(self):
+        self._actions: dict[str, _ActionQueries] = {}
+        self._engines: list[Any] = []
+        self._lock = threading.Lock()
+
+    def _listen(self, session: "Session") -> None:
+        bind = session.get_bind()
+        engine = getattr(bind, "engine", bind)
+        with self._lock:
+            if any(engine is known for known in self._engines):
+                return
+            self._engines.append(engine)
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, *args) -> None:
+        statements = _statements.get()
+        if statements is not None:
+            statements.append(" ".join(statement.split()))
+
+    @contextlib.contextmanager
+    def track(self, action: str, session: "Session | None") -> Iterator[None]:
+        """Attribute the statements executed inside the block to ``action``."""
+        if session is not None:
+            self._listen(session)
+
+        statements: list[str] = []
+        token = _statements.set(statements)
+        try:
+            yield
+        finally:
+            _statements.reset(token)
+            with self._lock:
+                queries = self._actions.get(action)
+                if queries is None:
+                    queries = self._actions[action] = _ActionQueries()
+                queries.calls += 1
+                queries.max_queries = max(queries.max_queries, len(statements))
+                queries.statements.update(statements)
+
+    def close(self) -> None:
+        """Stop listening to the engines seen so far."""
+        with self._lock:
+            engines, self._engines = self._engines, []
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", self._before_cursor_execute)
+
+    def as_dict(self) -> dict[str, dict[str, Any]]:
+        """Calls, queries and the executed statements per action."""
+        with self._lock:
+            return {
+                action: {
+                    "calls": queries.calls,
+                    "queries": sum(queries.statements.values()),
+                    "max_queries": queries.max_queries,
+                    "statements": dict(queries.statements.most_common()),
+                }
+                for action, queries in self._actions.items()
+            }
+
+    def report(self, statements: int = 3, width: int = 100) -> str:
+        """
+        Human readable report, actions with the most queries first.
+
+        :param statements: Number of most frequent statements shown per action.
+        :param width: Statements are truncated to this length.
+        """
+        actions = sorted(
+            self.as_dict().items(), key=lambda item: item[1]["queries"], reverse=True
+        )
+        lines = [
+            f"{'action':<40s} {'calls':>7s} {'queries':>8s} {'per call':>9s} {'max':>5s}"
+        ]
+        for action, queries in actions:
+            per_call = queries["queries"] / queries["calls"]
+            lines.append(
+                f"{action:<40s} {queries['calls']:7d} {queries['queries']:8d}"
+                f" {per_call:9.1f} {queries['max_queries']:5d}"
+            )
+            for statement, count in list(queries["statements"].items())[:statements]:
+                lines.append(f"    {count:6d} x {statement[:width]}")
+        return "\n".join(lines)
+
+
+@contextlib.contextmanager
+def profile_queries() -> Iterator[QueryProfiler]:
+    """Count the queries of all ``has_permission`` calls inside the block."""
+    global active
+    profiler = QueryProfiler()
+    previous, active = active, profiler
+    try:
+        yield profiler
+    finally:
+        active = previous
+        profiler.close()
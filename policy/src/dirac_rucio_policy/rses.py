@@ -0,0 +1,127 @@
+"""
+CTAO rucio policy: resolution and caching of RSE properties.
+
+The countries of many RSEs are resolved with a single query. They can be
+cached process-wide, configured by the ``rse_country_cache_size`` and
+``rse_country_cache_ttl`` options of the ``[policy]`` section of the rucio
+config. The RSEs matching an RSE expression can be cached the same way,
+configured by ``rse_expression_cache_size`` and ``rse_expression_cache_ttl``.
+The caches are disabled by default.
+"""
+
+from collections.abc import Iterable
+from typing import TYPE_CHECKING, Optional
+
+from rucio.common.constants import RseAttr
+from rucio.core.rse_expression_parser import parse_expression
+from rucio.db.sqla import models
+from rucio.db.sqla.session import read_session
+from sqlalchemy import select
+
+from . import config
+from .cache import TTLCache
+from .db import execute_in_chunks
+
+if TYPE_CHECKING:
+    from sqlalchemy.orm import Session
+
+__all__ = [
+    "RSE_COUNTRY_CACHE",
+    "RSE_EXPRESSION_CACHE",
+    "invalidate_rse_countries",
+    "invalidate_rse_expressions",
+    "query_rse_countries",
+    "resolve_rse_expression",
+    "rse_countries",
+]
+
+#: process-wide cache of the country attribute per RSE id
+RSE_COUNTRY_CACHE = TTLCache(
+    maxsize=config.get_int("rse_country_cache_size", 0),
+    ttl=config.get_float("rse_country_cache_ttl", 300.0),
+)
+
+#: process-wide cache of the RSE ids matching an (expression, vo)
+RSE_EXPRESSION_CACHE = TTLCache(
+    maxsize=config.get_int("rse_expression_cache_size", 0),
+    ttl=config.get_float("rse_expression_cache_ttl", 30.0),
+)
+
+
+@read_session
+def query_rse_countries(
+    rse_ids: Iterable[str], *, session: "Session"
+) -> dict[str, Optional[str]]:
+    """
+    Query the country attribute of many RSEs at once.
+
+    :param rse_ids: The ids of the RSEs.
+    :param session: The DB session to use
+    :returns: Mapping of RSE id to country, RSEs without a country are missing
+    """
+    stmt = select(
+        models.RSEAttrAssociation.rse_id,
+        models.RSEAttrAssociation.value,
+    ).where(models.RSEAttrAssociation.key == RseAttr.COUNTRY)
+    countries = {}
+    for rse_id, country in execute_in_chunks(
+        stmt, models.RSEAttrAssociation.rse_id, rse_ids, session=session
+    ):
+        countries[rse_id] = country
+    return countries
+
+
+def rse_countries(
+    rse_ids: Iterable[str], *, session: "Session | None" = None
+) -> dict[str, Optional[str]]:
+    """
+    Get the country attribute of many RSEs.
+
+    RSEs not found in the cache are resolved with a single query.
+
+    :param rse_ids: The ids of the RSEs.
+    :param session: The DB session to use
+    :returns: Mapping of RSE id to country, None for RSEs without a country
+    """
+    return RSE_COUNTRY_CACHE.get_many(
+        rse_ids, lambda missing: query_rse_countries(missing, session=session)
+    )
+
+
+def invalidate_rse_countries(rse_id: Optional[str] = None) -> None:
+    """
+    Remove the cached country of an RSE, e.g. when its attribute changes.
+
+    :param rse_id: The id of the RSE, if None all cached countries are removed.
+    """
+    if rse_id is None:
+        RSE_COUNTRY_CACHE.clear()
+    else:
+        RSE_COUNTRY_CACHE.invalidate(rse_id)
+
+
+def resolve_rse_expression(
+    expression: str, vo: str, *, session: "Session | None" = None
+) -> tuple[str, ...]:
+    """
+    Get the ids of the RSEs of a VO matching an RSE expression.
+
+    Invalid expressions or expressions without matching RSEs are not cached.
+
+    :param expression: The RSE expression.
+    :param vo: The VO of the RSEs.
+    :param session: The DB session to use
+    :returns: The ids of the matching RSEs
+    :raises InvalidRSEExpression: If the expression is invalid or matches no RSE
+    """
+
+    def resolve():
+        rses = parse_expression(expression, filter_={"vo": vo}, session=session)
+        return tuple(rse["id"] for rse in rses)
+
+    return RSE_EXPRESSION_CACHE.get((expression, vo), resolve)
+
+
+def invalidate_rse_expressions() -> None:
+    """Remove all cached RSE expressions, e.g. when RSEs or their attributes change."""
+    RSE_EXPRESSION_CACHE.clear()
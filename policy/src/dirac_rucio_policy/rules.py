@@ -0,0 +1,167 @@
+"""
+CTAO rucio policy: declarative permission rules.
+
+Most permission checks allow an action if any of a few predicates holds,
+e.g. the issuer is root or an admin. Such checks are described by a `Rule`
+and turned into a specialized function by `compile_rule`, which evaluates
+the predicates cheapest first, so checks needing the database are only
+made if no cheaper predicate allowed the action.
+"""
+
+from collections.abc import Callable, Mapping
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from .privileges import country_admin_countries, is_admin, is_scope_owner
+
+if TYPE_CHECKING:
+    from rucio.common.types import InternalAccount
+    from sqlalchemy.orm import Session
+
+    PermissionFunction = Callable[..., bool]
+
+__all__ = [
+    "ADMIN",
+    "ALLOW",
+    "COUNTRY_ADMIN",
+    "DENY",
+    "MOCK_SCOPE",
+    "OWN_ACCOUNT",
+    "ROOT",
+    "ROOT_ONLY",
+    "ROOT_OR_ADMIN",
+    "SCOPE_OWNER",
+    "Predicate",
+    "Rule",
+    "compile_rule",
+    "compile_rules",
+]
+
+Check = Callable[["InternalAccount", dict[str, Any], "Session | None"], bool]
+
+
+class Predicate(NamedTuple):
+    """A condition on the issuer and the arguments of an action."""
+
+    name: str
+    #: relative cost, 0 for checks without database access
+    cost: int
+    check: Check
+
+
+def _is_mock_scope(issuer, kwargs, session) -> bool:
+    scope = kwargs.get("scope")
+    return scope is not None and scope.external == "mock"
+
+
+def _is_scope_owner(issuer, kwargs, session) -> bool:
+    scope = kwargs.get("scope")
+    return scope is not None and is_scope_owner(scope, issuer, session=session)
+
+
+ROOT = Predicate("root", 0, lambda issuer, kwargs, session: issuer.external == "root")
+OWN_ACCOUNT = Predicate(
+    "own_account", 0, lambda issuer, kwargs, session: kwargs.get("account") == issuer
+)
+MOCK_SCOPE = Predicate("mock_scope", 0, _is_mock_scope)
+ADMIN = Predicate(
+    "admin", 1, lambda issuer, kwargs, session: is_admin(issuer, session=session)
+)
+# uses the account attributes already queried by ADMIN
+COUNTRY_ADMIN = Predicate(
+    "country_admin",
+    2,
+    lambda issuer, kwargs, session: bool(
+        country_admin_countries(issuer, session=session)
+    ),
+)
+SCOPE_OWNER = Predicate("scope_owner", 3, _is_scope_owner)
+
+
+class Rule(NamedTuple):
+    """Allow an action if any of the predicates holds, or always if ``allow_all``."""
+
+    any_of: tuple[Predicate, ...] = ()
+    allow_all: bool = False
+
+
+ALLOW = Rule(allow_all=True)
+DENY = Rule()
+ROOT_ONLY = Rule((ROOT,))
+ROOT_OR_ADMIN = Rule((ROOT, ADMIN))
+
+
+def compile_rule(rule: Rule, name: str = "perm_rule") -> "PermissionFunction":
+    """
+    Compile a rule into a permission check with the signature of the ``perm_*`` functions.
+
+    The predicates are evaluated in order of their cost, predicates of the
+    same cost in the order of the rule.
+
+    :param rule: The rule to compile.
+    :param name: The ``__name__`` of the returned function.
+    :returns: The permission check.
+    """
+    predicates = sorted(rule.any_of, key=lambda predicate: predicate.cost)
+    checks = tuple(predicate.check for predicate in predicates)
+
+    if rule.allow_all or not checks:
+        allowed = rule.allow_all
+
+        def check(issuer, kwargs, *, session=None):
+            return allowed
+
+    elif predicates[0] is ROOT and len(checks) <= 4:
+        # the most common rules, unrolled with the root check inlined
+        a, b, c = checks[1:] + (None,) * (4 - len(checks))
+        if a is None:
+
+            def check(issuer, kwargs, *, session=None):
+                return issuer.external == "root"
+
+        elif b is None:
+
+            def check(issuer, kwargs, *, session=None):
+                return issuer.external == "root" or a(issuer, kwargs, session)
+
+        elif c is None:
+
+            def check(issuer, kwargs, *, session=None):
+                return (
+                    issuer.external == "root"
+                    or a(issuer, kwargs, session)
+                    or b(issuer, kwargs, session)
+                )
+
+        else:
+
+            def check(issuer, kwargs, *, session=None):
+                return (
+                    issuer.external == "root"
+                    or a(issuer, kwargs, session)
+                    or b(issuer, kwargs, session)
+                    or c(issuer, kwargs, session)
+                )
+
+    else:
+
+        def check(issuer, kwargs, *, session=None):
+            for predicate in checks:
+                if predicate(issuer, kwargs, session):
+                    return True
+            return False
+
+    check.__name__ = check.__qualname__ = name
+    if rule.allow_all:
+        check.__doc__ = "Always allowed."
+    elif not predicates:
+        check.__doc__ = "Always denied."
+    else:
+        check.__doc__ = "Allowed if any of: " + ", ".join(p.name for p in predicates)
+    return check
+
+
+def compile_rules(rules: Mapping[str, Rule]) -> dict[str, "PermissionFunction"]:
+    """Compile the rules of many actions, the functions are named ``perm_<action>``."""
+    return {
+        action: compile_rule(rule, f"perm_{action}") for action, rule in rules.items()
+    }
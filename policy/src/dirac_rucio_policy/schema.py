@@ -4,6 +4,8 @@ CTAO rucio policy: schema.
 Modified from lib/rucio/common/schema/generic.py.
 """
 
+import re
+
 from jsonschema import ValidationError, validate
 from rucio.common.exception import InvalidObject
 
@@ -496,6 +498,34 @@ ACCOUNT_ATTRIBUTE = {
 # CHANGED from default, taken from belleii schema to make work with dirac
 SCOPE_NAME_REGEXP = "/([^/]*)(?=/)(.*)"
 
+#: precompiled SCOPE_NAME_REGEXP, rucio itself reads the string above
+SCOPE_NAME_PATTERN = re.compile(SCOPE_NAME_REGEXP)
+
+
+def split_scope_names(urls):
+    """
+    Split many ``<scope>/<name>`` REST path segments into scope and name.
+
+    Same as rucio's ``parse_scope_name`` for each of the segments, but using
+    the precompiled `SCOPE_NAME_PATTERN`.
+
+    :param urls: The path segments, e.g. ``dl0/ctao.org/dl0/file.dat``.
+    :returns: List of (scope, name) tuples.
+    :raises ValueError: if one of the segments does not match the pattern.
+    """
+    match = SCOPE_NAME_PATTERN.match
+    scope_names = []
+    for url in urls:
+        m = match("/" + url)
+        if m is None:
+            raise ValueError(
+                f"Could not parse {url!r} with pattern {SCOPE_NAME_REGEXP!r}"
+                " into scope and name."
+            )
+        scope_names.append(m.group(1, 2))
+    return scope_names
+
+
 DISTANCE = {
     "description": "RSE distance",
     "type": "object",
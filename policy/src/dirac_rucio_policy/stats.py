@@ -0,0 +1,197 @@
+"""
+CTAO rucio policy: statistics of the permission decisions.
+
+Records per-action call counts, allow / deny counts and latency histograms
+of sampled ``has_permission`` calls, which can be dumped in the Prometheus
+text format or as JSON.
+"""
+
+import bisect
+import json
+import math
+import random
+import threading
+from collections.abc import Callable, Sequence
+from typing import Any
+
+__all__ = [
+    "DEFAULT_BUCKETS",
+    "LatencyHistogram",
+    "PermissionStats",
+]
+
+#: upper bounds of the latency buckets in seconds
+DEFAULT_BUCKETS = (
+    1e-5,
+    2.5e-5,
+    5e-5,
+    1e-4,
+    2.5e-4,
+    5e-4,
+    1e-3,
+    2.5e-3,
+    5e-3,
+    1e-2,
+    2.5e-2,
+    5e-2,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    math.inf,
+)
+
+
+class LatencyHistogram:
+    """Histogram of durations with fixed upper bucket bounds."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        if list(buckets) != sorted(buckets) or buckets[-1] != math.inf:
+            raise ValueError("Buckets must be sorted and end with math.inf")
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def cumulative(self) -> list[tuple[float, int]]:
+        """Pairs of upper bound and number of observations up to it."""
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class _ActionStats:
+    __slots__ = ("allowed", "denied", "latency")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.allowed = 0
+        self.denied = 0
+        self.latency = LatencyHistogram(buckets)
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == math.inf else repr(bound)
+
+
+class PermissionStats:
+    """
+    Statistics of sampled permission decisions.
+
+    A fraction ``sample_rate`` of all calls is recorded, all counts refer
+    to the sampled calls. With a sample rate of zero, nothing is recorded
+    and checking `enabled` is the only overhead.
+    """
+
+    def __init__(
+        self,
+        sample_rate: float = 0.0,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        rng: Callable[[], float] = random.random,
+    ):
+        self.buckets = tuple(buckets)
+        self.rng = rng
+        self._actions: dict[str, _ActionStats] = {}
+        self._lock = threading.Lock()
+        self.configure(sample_rate)
+
+    def configure(self, sample_rate: float) -> None:
+        """Change the sample rate, removing all recorded statistics."""
+        if not 0 <= sample_rate <= 1:
+            raise ValueError(f"Sample rate must be in [0, 1], got {sample_rate}")
+        with self._lock:
+            self.sample_rate = sample_rate
+            #: plain attribute, so checking it is as cheap as possible
+            self.enabled = sample_rate > 0
+            self._actions.clear()
+
+    def reset(self) -> None:
+        """Remove all recorded statistics."""
+        with self._lock:
+            self._actions.clear()
+
+    def sample(self) -> bool:
+        """Decide if the current call should be recorded."""
+        return self.sample_rate >= 1 or self.rng() < self.sample_rate
+
+    def record(self, action: str, allowed: bool, seconds: float) -> None:
+        """Record a permission decision and how long it took."""
+        with self._lock:
+            stats = self._actions.get(action)
+            if stats is None:
+                stats = self._actions[action] = _ActionStats(self.buckets)
+            if allowed:
+                stats.allowed += 1
+            else:
+                stats.denied += 1
+            stats.latency.observe(seconds)
+
+    def as_dict(self) -> dict[str, Any]:
+        """The recorded statistics as json serializable dict."""
+        with self._lock:
+            return {
+                "sample_rate": self.sample_rate,
+                "actions": {
+                    action: {
+                        "calls": stats.allowed + stats.denied,
+                        "allowed": stats.allowed,
+                        "denied": stats.denied,
+                        "latency": {
+                            "buckets": {
+                                _format_bound(bound): count
+                                for bound, count in stats.latency.cumulative()
+                            },
+                            "sum": stats.latency.sum,
+                            "count": stats.latency.count,
+                        },
+                    }
+                    for action, stats in sorted(self._actions.items())
+                },
+            }
+
+    def to_json(self, **kwargs) -> str:
+        """The recorded statistics as JSON, ``kwargs`` are passed to `json.dumps`."""
+        return json.dumps(self.as_dict(), **kwargs)
+
+    def to_prometheus(self, prefix: str = "rucio_policy_permission") -> str:
+        """The recorded statistics in the Prometheus text exposition format."""
+        stats = self.as_dict()
+        lines = [
+            f"# HELP {prefix}_sample_rate Fraction of the permission checks recorded.",
+            f"# TYPE {prefix}_sample_rate gauge",
+            f"{prefix}_sample_rate {stats['sample_rate']!r}",
+            f"# HELP {prefix}_calls_total Sampled permission checks per action and decision.",
+            f"# TYPE {prefix}_calls_total counter",
+        ]
+        for action, values in stats["actions"].items():
+            for decision in ("allowed", "denied"):
+                lines.append(
+                    f'{prefix}_calls_total{{action="{action}",decision="{decision}"}}'
+                    f" {values[decision]}"
+                )
+
+        lines.append(
+            f"# HELP {prefix}_duration_seconds Duration of the sampled permission checks."
+        )
+        lines.append(f"# TYPE {prefix}_duration_seconds histogram")
+        for action, values in stats["actions"].items():
+            latency = values["latency"]
+            for bound, count in latency["buckets"].items():
+                lines.append(
+                    f'{prefix}_duration_seconds_bucket{{action="{action}",le="{bound}"}}'
+                    f" {count}"
+                )
+            lines.append(
+                f'{prefix}_duration_seconds_sum{{action="{action}"}} {latency["sum"]!r}'
+            )
+            lines.append(
+                f'{prefix}_duration_seconds_count{{action="{action}"}} {latency["count"]}'
+            )
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+# permission.py imports rucio.core, which requires a rucio configuration.
+# Outside of the rucio server container, provide a minimal one.
+if "RUCIO_CONFIG" not in os.environ and not os.path.exists("/opt/rucio/etc/rucio.cfg"):
+    import atexit
+    import tempfile
+
+    with tempfile.NamedTemporaryFile(
+        "w", prefix="rucio_", suffix=".cfg", delete=False
+    ) as _config:
+        _config.write(
+            "[common]\nextract_scope = dirac\n\n"
+            "[policy]\npackage = dirac_rucio_policy\n"
+        )
+    atexit.register(os.unlink, _config.name)
+    os.environ["RUCIO_CONFIG"] = _config.name
+
+
+@pytest.fixture
+def db_session():
+    """Session of an in-memory SQLite database with the rucio tables."""
+    import sqlalchemy as sa
+    from rucio.db.sqla import models
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+
+    engine = sa.create_engine(
+        "sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False}
+    )
+    models.register_models(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(models.VO(vo="def", description="Default VO", email="N/A"))
+    session.flush()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+@pytest.fixture
+def country_admin(db_session):
+    """A country admin of "de" and RSEs in "de" and "fr"."""
+    from rucio.common.types import InternalAccount
+    from rucio.core.account import add_account, add_account_attribute
+    from rucio.core.rse import add_rse, add_rse_attribute
+    from rucio.db.sqla.constants import AccountType
+
+    account = InternalAccount("country")
+    add_account(account, AccountType.USER, "country@example.org", session=db_session)
+    add_account_attribute(account, "country-de", "admin", session=db_session)
+    for i in range(6):
+        rse_id = add_rse(f"COUNTRY-{i}", vo="def", session=db_session)
+        add_rse_attribute(
+            rse_id, "country", "de" if i < 5 else "fr", session=db_session
+        )
+    return account
@@ -1,3 +1,5 @@
+import re
+
 import pytest
 
 long_lfn = "/ctao/test/telescope/TEL001/events/2024/06/17/TEL001_SDH001_20240617T030105_SBID2000012345_OBSID2000006789_TEL_SHOWER_CHUNK000.fits.fz"
@@ -5,10 +7,13 @@ lfns = {
     "/ctao.org/foo/foo.dat": "foo",
     "/ctao.org/bar/test.dat": "bar",
     long_lfn: "test",
+    "/ctao.org/foo": "foo",
+    "//ctao.org//foo/bar.dat": "foo",
     # special handling
     "/testvo.example.org/": "root",
     "/testvo.example.org": "root",
     "/": "root",
+    "/testvo.example.org//": "root",
 }
 
 
@@ -30,3 +35,174 @@ def test_extract_scope_ctao_invalid(lfn):
 
     with pytest.raises(ValueError, match="DID 'test/bar/baz' does not match"):
         extract_scope_dirac("test/bar/baz", scopes=None)
+
+
+def test_extract_scopes_ctao():
+    from dirac_rucio_policy.algorithms import extract_scopes_dirac
+
+    scopes, names = extract_scopes_dirac(list(lfns))
+    assert scopes == list(lfns.values())
+    assert names == list(lfns)
+
+
+def test_extract_scopes_ctao_invalid():
+    from dirac_rucio_policy.algorithms import InvalidDIDsError, extract_scopes_dirac
+
+    dids = list(lfns)
+    dids.insert(1, "test:foo.dat")
+    dids.append("test/bar/baz")
+
+    with pytest.raises(InvalidDIDsError, match="2 invalid DIDs") as e:
+        extract_scopes_dirac(dids)
+
+    assert e.value.indices == [1, len(dids) - 1]
+    assert "'test:foo.dat' does not match" in e.value.reasons[1]
+    assert isinstance(e.value, ValueError)
+
+
+def test_extract_scopes_ctao_numpy():
+    np = pytest.importorskip("numpy")
+    from dirac_rucio_policy.algorithms import extract_scopes_dirac
+
+    scopes, names = extract_scopes_dirac(np.array(list(lfns)))
+    assert isinstance(scopes, np.ndarray)
+    np.testing.assert_array_equal(scopes, list(lfns.values()))
+    np.testing.assert_array_equal(names, list(lfns))
+
+
+@pytest.mark.parametrize(("lfn", "expected_scope"), lfns.items())
+def test_scope_rules_default(lfn, expected_scope):
+    from dirac_rucio_policy.algorithms import ScopeRules
+
+    # without any rules, the result is the same as the default algorithm
+    assert ScopeRules({}).extract(lfn) == expected_scope
+
+
+def test_scope_rules():
+    from dirac_rucio_policy.algorithms import ScopeRules
+
+    rules = ScopeRules.parse(
+        "/ctao.org=1, /ctao.org/user=2:alice|bob, /other.org/a/b=1"
+    )
+    assert rules.extract("/ctao.org/dl0/foo.dat") == "dl0"
+    assert rules.extract("/ctao.org/user/x/alice/foo.dat") == "alice"
+    assert rules.extract("/ctao.org//user/x/bob") == "bob"
+    assert rules.extract("/ctao.org/user/x") == "root"
+    assert rules.extract("/other.org/a/b/c/foo.dat") == "c"
+    # no rule for /other.org/a, default of /<VO>/<scope>
+    assert rules.extract("/other.org/a/c/foo.dat") == "a"
+    assert rules.extract("/other.org") == "root"
+
+    with pytest.raises(ValueError, match="Scope 'eve' of DID .* is not allowed"):
+        rules.extract("/ctao.org/user/x/eve/foo.dat")
+
+
+@pytest.mark.parametrize("text", ["ctao.org=1", "/ctao.org", "/ctao.org=0"])
+def test_scope_rules_invalid(text):
+    from dirac_rucio_policy.algorithms import ScopeRules
+
+    with pytest.raises(ValueError):
+        ScopeRules.parse(text)
+
+
+def test_extract_scope_rules_config(monkeypatch):
+    from dirac_rucio_policy import algorithms
+
+    rules = algorithms.ScopeRules.parse("/ctao.org/user=2")
+    monkeypatch.setattr(algorithms, "get_scope_rules", lambda: rules)
+
+    lfn = "/ctao.org/user/a/alice/foo.dat"
+    assert algorithms.extract_scope_dirac(lfn, scopes=None) == ("alice", lfn)
+    scopes, _ = algorithms.extract_scopes_dirac([lfn, "/ctao.org/dl0/foo"])
+    assert scopes == ["alice", "dl0"]
+
+    # DIDs rejected by a rule are collected with the reason
+    rules = algorithms.ScopeRules.parse("/ctao.org/user=2:alice")
+    monkeypatch.setattr(algorithms, "get_scope_rules", lambda: rules)
+    dids = [lfn, "/ctao.org/user/a/eve/foo.dat", "foo.dat"]
+    with pytest.raises(algorithms.InvalidDIDsError) as e:
+        algorithms.extract_scopes_dirac(dids)
+    assert e.value.indices == [1, 2]
+    assert "Scope 'eve' of DID" in e.value.reasons[1]
+    assert "is not allowed" in e.value.reasons[1]
+    assert "does not match expected schema" in e.value.reasons[2]
+
+
+def test_extract_scope_known_scopes():
+    from dirac_rucio_policy.algorithms import extract_scope_dirac
+
+    scopes = ["root", "foo"]
+    assert extract_scope_dirac("/ctao.org/foo/foo.dat", scopes)[0] == "foo"
+    assert extract_scope_dirac("/ctao.org", scopes)[0] == "root"
+
+    with pytest.raises(ValueError, match="Scope 'bar' of DID .* does not exist"):
+        extract_scope_dirac("/ctao.org/bar/test.dat", scopes)
+
+    scopes.append("bar")
+    assert extract_scope_dirac("/ctao.org/bar/test.dat", scopes)[0] == "bar"
+
+    # changes of the list in place are seen, even if the length is the same
+    scopes[-1] = "baz"
+    with pytest.raises(ValueError, match="Scope 'bar' of DID .* does not exist"):
+        extract_scope_dirac("/ctao.org/bar/test.dat", scopes)
+
+    assert extract_scope_dirac("/ctao.org/baz/test.dat", {"baz"})[0] == "baz"
+
+
+def test_extract_scopes_known_scopes():
+    from dirac_rucio_policy.algorithms import InvalidDIDsError, extract_scopes_dirac
+
+    dids = ["/ctao.org/foo/foo.dat", "/ctao.org"]
+    assert extract_scopes_dirac(dids, ["root", "foo"])[0] == ["foo", "root"]
+    assert extract_scopes_dirac(dids, frozenset(["root", "foo"]))[0] == ["foo", "root"]
+
+    # all DIDs with unknown scopes are collected, not only the first
+    dids = ["/ctao.org/bar/a.dat", "/ctao.org/foo/b.dat", "/ctao.org", "c.dat"]
+    with pytest.raises(InvalidDIDsError, match="3 invalid DIDs") as e:
+        extract_scopes_dirac(dids, ["foo"])
+    assert e.value.reasons == {
+        0: "Scope 'bar' of DID '/ctao.org/bar/a.dat' does not exist.",
+        2: "Scope 'root' of DID '/ctao.org' does not exist.",
+        3: "DID 'c.dat' does not match expected schema: /<VO Name>/<scope>/<path>.",
+    }
+
+
+@pytest.mark.parametrize("lfn", [lfn for lfn in lfns if lfn.count("/") > 2])
+def test_lfn2pfn_hash(lfn):
+    from dirac_rucio_policy.algorithms import lfn2pfn_dirac_hash, pfn2lfn_dirac_hash
+
+    path = lfn2pfn_dirac_hash("test", lfn, "RSE", {}, {})
+    directory, _, filename = lfn.rpartition("/")
+    assert path.startswith(directory + "/")
+    assert path.endswith("/" + filename)
+    assert len(path) == len(lfn) + 6
+    assert lfn2pfn_dirac_hash("test", lfn, "OTHER", {}, {}) == path
+    assert pfn2lfn_dirac_hash(path) == lfn
+
+
+@pytest.mark.parametrize("name", ["file.dat", "/file.dat", "dir/file.dat"])
+def test_lfn2pfn_hash_relative(name):
+    from dirac_rucio_policy.algorithms import lfn2pfn_dirac_hash, pfn2lfn_dirac_hash
+
+    path = lfn2pfn_dirac_hash("test", name, "RSE", {}, {})
+    assert path.startswith("/") == name.startswith("/")
+    assert pfn2lfn_dirac_hash(path) == name
+
+
+def test_lfn2pfn_hash_fanout(monkeypatch):
+    from dirac_rucio_policy import algorithms
+
+    monkeypatch.setattr(algorithms, "get_hash_fanout", lambda: (3, 1))
+    path = algorithms.lfn2pfn_dirac_hash("foo", "/ctao.org/foo/foo.dat", None, {}, {})
+    assert re.fullmatch("/ctao.org/foo/[0-9a-f]/[0-9a-f]/[0-9a-f]/foo.dat", path)
+    assert algorithms.pfn2lfn_dirac_hash(path) == "/ctao.org/foo/foo.dat"
+
+    with pytest.raises(ValueError, match="does not contain 3 hash directories"):
+        algorithms.pfn2lfn_dirac_hash("/a/b")
+
+
+def test_lfn2pfn_registered():
+    from dirac_rucio_policy import get_algorithms
+    from dirac_rucio_policy.algorithms import lfn2pfn_dirac_hash
+
+    assert get_algorithms()["lfn2pfn"]["dirac_hash"] is lfn2pfn_dirac_hash
@@ -0,0 +1,135 @@
+import gc
+
+
+class StubSession:
+    """Stand-in for a DB session, only used as cache key."""
+
+
+def test_session_cache():
+    from dirac_rucio_policy.cache import SessionCache
+
+    cache = SessionCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return len(calls)
+
+    session = StubSession()
+    assert cache.get(session, "key", compute) == 1
+    assert cache.get(session, "key", compute) == 1
+    assert cache.get(StubSession(), "key", compute) == 2
+    assert cache.get(None, "key", compute) == 3
+    assert cache.get(None, "key", compute) == 4
+
+    cache.invalidate(session, "key")
+    assert cache.get(session, "key", compute) == 5
+
+
+def test_session_cache_released_with_session():
+    from dirac_rucio_policy.cache import SessionCache
+
+    cache = SessionCache()
+    session = StubSession()
+    cache.get(session, "key", lambda: "value")
+    assert len(cache._data) == 1
+
+    del session
+    gc.collect()
+    assert len(cache._data) == 0
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_cache_expiry():
+    from dirac_rucio_policy.cache import TTLCache
+
+    timer = FakeTimer()
+    cache = TTLCache(maxsize=10, ttl=5, timer=timer)
+    values = iter(range(10))
+
+    assert cache.get("key", lambda: next(values)) == 0
+    timer.now = 4.9
+    assert cache.get("key", lambda: next(values)) == 0
+    timer.now = 5.0
+    assert cache.get("key", lambda: next(values)) == 1
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    cache.invalidate("key")
+    assert cache.get("key", lambda: next(values)) == 2
+
+
+def test_ttl_cache_lru():
+    from dirac_rucio_policy.cache import TTLCache
+
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    # access a, so b is the least recently used
+    assert cache.get("a", lambda: None) == 1
+    cache.set("c", 3)
+
+    assert len(cache) == 2
+    assert cache.get("b", lambda: "new") == "new"
+    assert cache.get("c", lambda: "new") == 3
+
+
+def test_ttl_cache_disabled():
+    from dirac_rucio_policy.cache import TTLCache
+
+    cache = TTLCache(maxsize=0, ttl=60)
+    assert not cache.enabled
+    assert cache.get("a", lambda: 1) == 1
+    assert cache.get("a", lambda: 2) == 2
+    assert len(cache) == 0
+
+
+def test_ttl_cache_get_many():
+    from dirac_rucio_policy.cache import TTLCache
+
+    timer = FakeTimer()
+    cache = TTLCache(maxsize=10, ttl=5, timer=timer)
+    calls = []
+
+    def compute(keys):
+        calls.append(keys)
+        # "c" has no value
+        return {key: key.upper() for key in keys if key != "c"}
+
+    assert cache.get_many(["a", "b", "a"], compute) == {"a": "A", "b": "B"}
+    assert cache.get_many(["b", "c", "a"], compute) == {"b": "B", "c": None, "a": "A"}
+    assert cache.get_many(["c"], compute) == {"c": None}
+    assert calls == [["a", "b"], ["c"]]
+    assert cache.hits == 3 and cache.misses == 3
+
+    timer.now = 5.0
+    cache.get_many(["a", "d"], compute)
+    assert calls[-1] == ["a", "d"]
+
+    cache.configure(maxsize=0, ttl=5)
+    cache.get_many(["a"], compute)
+    cache.get_many([], compute)
+    assert calls[-1] == ["a"]
+    assert len(calls) == 4
+
+
+def test_ttl_cache_lookup():
+    from dirac_rucio_policy.cache import TTLCache
+
+    timer = FakeTimer()
+    cache = TTLCache(maxsize=10, ttl=5, timer=timer)
+    assert cache.lookup("key") is None
+    assert cache.lookup("key", False) is False
+    assert len(cache) == 0
+
+    cache.set("key", "value")
+    assert cache.lookup("key") == "value"
+    timer.now = 5.0
+    assert cache.lookup("key", "default") == "default"
+    assert cache.hits == 1 and cache.misses == 3
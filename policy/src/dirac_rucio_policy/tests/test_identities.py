@@ -0,0 +1,93 @@
+import pytest
+from rucio.common.types import InternalAccount
+
+DN = "/DC=org/DC=ctao/OU=pilots/CN=pilot"
+
+
+@pytest.fixture
+def pilot(db_session):
+    """An account with a mapped x509 identity."""
+    from rucio.core.account import add_account
+    from rucio.core.identity import add_account_identity
+    from rucio.db.sqla.constants import AccountType, IdentityType
+
+    account = InternalAccount("pilot")
+    add_account(account, AccountType.USER, "pilot@example.org", session=db_session)
+    add_account_identity(
+        DN, IdentityType.X509, account, "pilot@example.org", session=db_session
+    )
+    return account
+
+
+@pytest.fixture
+def identity_caches():
+    from dirac_rucio_policy.identities import IDENTITY_CACHE, NEGATIVE_IDENTITY_CACHE
+
+    IDENTITY_CACHE.configure(maxsize=100, ttl=60)
+    yield IDENTITY_CACHE, NEGATIVE_IDENTITY_CACHE
+    for cache in (IDENTITY_CACHE, NEGATIVE_IDENTITY_CACHE):
+        cache.configure(maxsize=0, ttl=0)
+        cache.clear()
+
+
+def token_requests(session, account, n, dn=DN):
+    from dirac_rucio_policy.permission import has_permission
+    from dirac_rucio_policy.profiling import profile_queries
+
+    kwargs = {"account": account, "dn": dn}
+    with profile_queries() as profiler:
+        allowed = [
+            has_permission(account, "get_auth_token_x509", kwargs, session=session)
+            for _ in range(n)
+        ]
+    assert len(set(allowed)) == 1
+    return allowed[0], profiler.as_dict()["get_auth_token_x509"]["queries"]
+
+
+def test_no_cache(db_session, pilot):
+    assert token_requests(db_session, pilot, 3) == (True, 3)
+    assert token_requests(db_session, pilot, 3, dn="/CN=other") == (False, 3)
+
+
+def test_positive_cache(db_session, pilot, identity_caches):
+    assert token_requests(db_session, pilot, 3) == (True, 1)
+    # missing mappings are not cached by default
+    assert token_requests(db_session, pilot, 3, dn="/CN=other") == (False, 3)
+    assert token_requests(db_session, InternalAccount("other"), 2) == (False, 2)
+
+
+def test_negative_cache(db_session, pilot, identity_caches):
+    _, negative = identity_caches
+    negative.configure(maxsize=100, ttl=10)
+
+    assert token_requests(db_session, pilot, 3, dn="/CN=other") == (False, 1)
+    assert token_requests(db_session, pilot, 3) == (True, 1)
+
+
+@pytest.mark.parametrize(
+    "action, kwargs",
+    [
+        ("del_account_identity", {"account": InternalAccount("pilot")}),
+        ("del_identity", {"accounts": [InternalAccount("pilot")]}),
+        ("del_account", {"account": InternalAccount("pilot")}),
+        (
+            "add_account_identity",
+            {"identity": "/CN=other", "type": "X509", "account": "pilot"},
+        ),
+    ],
+)
+def test_identity_invalidation(db_session, pilot, identity_caches, action, kwargs):
+    from dirac_rucio_policy.permission import has_permission
+
+    positive, negative = identity_caches
+    negative.configure(maxsize=100, ttl=10)
+    token_requests(db_session, pilot, 1)
+    token_requests(db_session, pilot, 1, dn="/CN=other")
+    assert len(positive) == len(negative) == 1
+
+    # denied actions do not change anything
+    assert not has_permission(pilot, action, kwargs, session=db_session)
+    assert len(positive) == len(negative) == 1
+
+    assert has_permission(InternalAccount("root"), action, kwargs, session=db_session)
+    assert len(positive) == len(negative) == 0
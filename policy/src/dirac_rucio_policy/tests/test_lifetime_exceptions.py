@@ -0,0 +1,150 @@
+import uuid
+
+import pytest
+from rucio.common.types import InternalAccount, InternalScope
+
+
+@pytest.fixture
+def lifetime_exceptions(db_session):
+    """Exceptions with DIDs in VO "def", "abc" and both, returns their ids."""
+    from rucio.db.sqla import models
+    from rucio.db.sqla.constants import DIDType, LifetimeExceptionsState
+
+    ids = {vo: uuid.uuid4().hex for vo in ("def", "abc", "mixed")}
+    dids = [
+        ("def", "def"),
+        ("def", "def"),
+        ("abc", "abc"),
+        ("mixed", "def"),
+        ("mixed", "abc"),
+    ]
+    for i, (key, vo) in enumerate(dids):
+        db_session.add(
+            models.LifetimeException(
+                id=ids[key],
+                scope=InternalScope("user", vo=vo),
+                name=f"file-{i}",
+                did_type=DIDType.FILE,
+                account=InternalAccount("alice", vo=vo),
+                state=LifetimeExceptionsState.WAITING,
+            )
+        )
+    db_session.flush()
+    return ids
+
+
+@pytest.fixture
+def exception_cache():
+    from dirac_rucio_policy.lifetime_exceptions import LIFETIME_EXCEPTION_CACHE
+
+    LIFETIME_EXCEPTION_CACHE.clear()
+    yield LIFETIME_EXCEPTION_CACHE
+    LIFETIME_EXCEPTION_CACHE.clear()
+
+
+def test_exception_vos(db_session, lifetime_exceptions, exception_cache, monkeypatch):
+    from dirac_rucio_policy import db
+    from dirac_rucio_policy import lifetime_exceptions as module
+    from dirac_rucio_policy.profiling import QueryProfiler
+
+    ids = lifetime_exceptions
+    unknown = uuid.uuid4().hex
+    expected = {
+        ids["def"]: {"def"},
+        ids["abc"]: {"abc"},
+        ids["mixed"]: {"def", "abc"},
+    }
+    assert module.query_exception_vos(ids.values(), session=db_session) == expected
+    monkeypatch.setattr(db, "MAX_IN_CLAUSE", 2)
+    assert module.query_exception_vos(ids.values(), session=db_session) == expected
+
+    profiler = QueryProfiler()
+    try:
+        with profiler.track("exceptions", db_session):
+            # ids with dashes and invalid ids are accepted as well
+            requested = [ids["abc"], str(uuid.UUID(ids["def"])), "invalid", unknown]
+            vos = module.exception_vos(requested, session=db_session)
+            assert vos == [{"abc"}, {"def"}, set(), set()]
+            assert module.exception_vos(requested, session=db_session) == vos
+    finally:
+        profiler.close()
+
+    # the first call is split into two queries of up to two ids,
+    # the second one only queries the unknown id again
+    assert profiler.as_dict()["exceptions"]["queries"] == 3
+    assert len(exception_cache) == 2
+
+
+def test_exception_vos_created_later(db_session, lifetime_exceptions, exception_cache):
+    from rucio.db.sqla import models
+    from rucio.db.sqla.constants import DIDType, LifetimeExceptionsState
+
+    from dirac_rucio_policy.lifetime_exceptions import exception_vos
+
+    # an exception not yet visible when first checked is not cached as unknown
+    exception_id = uuid.uuid4().hex
+    assert exception_vos([exception_id], session=db_session) == [set()]
+    db_session.add(
+        models.LifetimeException(
+            id=exception_id,
+            scope=InternalScope("user"),
+            name="file-late",
+            did_type=DIDType.FILE,
+            account=InternalAccount("alice"),
+            state=LifetimeExceptionsState.WAITING,
+        )
+    )
+    db_session.flush()
+    assert exception_vos([exception_id], session=db_session) == [{"def"}]
+
+
+@pytest.mark.parametrize(
+    "issuer, allowed",
+    [
+        ("root", [True, False, False, True, False]),
+        ("alice", [False] * 5),
+    ],
+)
+def test_update_lifetime_exceptions(
+    db_session, lifetime_exceptions, exception_cache, issuer, allowed
+):
+    from dirac_rucio_policy.permission import (
+        has_permission,
+        perm_update_lifetime_exceptions_bulk,
+    )
+    from dirac_rucio_policy.profiling import QueryProfiler, profile_queries
+
+    ids = lifetime_exceptions
+    issuer = InternalAccount(issuer)
+    kwargs_list = [
+        {"exception_id": ids["def"], "vo": "def"},
+        {"exception_id": ids["abc"], "vo": "def"},
+        {"exception_id": ids["mixed"], "vo": "def"},
+        {"exception_id": ids["abc"], "vo": None},
+        {"exception_id": uuid.uuid4().hex, "vo": "def"},
+    ]
+
+    with profile_queries() as profiler:
+        result = [
+            has_permission(
+                issuer, "update_lifetime_exceptions", kwargs, session=db_session
+            )
+            for kwargs in kwargs_list
+        ]
+    assert result == allowed
+    # one query per checked exception for root, the attribute query for alice
+    queries = profiler.as_dict()["update_lifetime_exceptions"]["queries"]
+    assert queries == (4 if issuer.external == "root" else 1)
+
+    exception_cache.clear()
+    profiler = QueryProfiler()
+    try:
+        with profiler.track("bulk", db_session):
+            bulk = perm_update_lifetime_exceptions_bulk(
+                issuer, kwargs_list, session=db_session
+            )
+    finally:
+        profiler.close()
+    assert bulk == allowed
+    # the attributes of alice are already cached in the session
+    assert profiler.as_dict()["bulk"]["queries"] == (issuer.external == "root")
@@ -0,0 +1,519 @@
+import pytest
+from rucio.common.types import InternalAccount, InternalScope
+
+
+class StubSession:
+    """Stand-in for a DB session, only used as cache key."""
+
+
+@pytest.fixture
+def attribute_queries(monkeypatch):
+    """Replace the attribute queries with fakes, returns the attribute queries."""
+    from dirac_rucio_policy import privileges
+
+    attributes = {
+        "alice": {},
+        "admin": {"admin": True},
+        "country": {"country-de": "admin"},
+    }
+    queries = []
+
+    def query_account_attributes(account, *, session):
+        queries.append((account, session))
+        return attributes[account.external]
+
+    monkeypatch.setattr(
+        privileges, "query_account_attributes", query_account_attributes
+    )
+    monkeypatch.setattr(
+        privileges, "is_account_active", lambda account, *, session: True
+    )
+    return queries
+
+
+@pytest.fixture
+def scope_owner(monkeypatch):
+    """Each account owns the scope of the same name, returns the queries made."""
+    import rucio.core.scope
+
+    from dirac_rucio_policy import privileges
+
+    queries = []
+
+    def is_scope_owner(scope, account, *, session):
+        queries.append(("is_scope_owner", scope, account))
+        return scope.external == account.external
+
+    def query_owned_scopes(account, *, session):
+        queries.append(("owned_scopes", account))
+        return frozenset([InternalScope(account.external)])
+
+    monkeypatch.setattr(rucio.core.scope, "is_scope_owner", is_scope_owner)
+    monkeypatch.setattr(privileges, "query_owned_scopes", query_owned_scopes)
+    return queries
+
+
+@pytest.fixture
+def privilege_cache():
+    from dirac_rucio_policy.privileges import PRIVILEGE_CACHE
+
+    maxsize, ttl = PRIVILEGE_CACHE.maxsize, PRIVILEGE_CACHE.ttl
+    PRIVILEGE_CACHE.configure(maxsize=10, ttl=60)
+    yield PRIVILEGE_CACHE
+    PRIVILEGE_CACHE.configure(maxsize=maxsize, ttl=ttl)
+
+
+def test_one_query_per_request(attribute_queries, scope_owner):
+    from dirac_rucio_policy.permission import has_permission
+
+    issuer = InternalAccount("alice")
+    session = StubSession()
+    rules = [{"account": issuer}]
+
+    # perm_add_did checks the admin attribute twice
+    kwargs = {"scope": InternalScope("alice"), "rules": rules}
+    assert has_permission(issuer, "add_did", kwargs, session=session)
+    assert len(attribute_queries) == 1
+
+    kwargs = {"dids": [{"rules": rules}]}
+    assert not has_permission(issuer, "add_dids", kwargs, session=session)
+    assert not has_permission(issuer, "add_rse", {}, session=session)
+    assert len(attribute_queries) == 1
+
+    # new session, new request
+    assert not has_permission(issuer, "add_rse", {}, session=StubSession())
+    assert len(attribute_queries) == 2
+
+
+def test_queries_per_issuer(attribute_queries):
+    from dirac_rucio_policy.permission import has_permission
+
+    session = StubSession()
+    admin = InternalAccount("admin")
+    country_admin = InternalAccount("country")
+
+    assert has_permission(admin, "add_rse", {}, session=session)
+    assert not has_permission(country_admin, "add_rse", {}, session=session)
+    kwargs = {"account": InternalAccount("alice")}
+    assert has_permission(
+        country_admin, "get_local_account_usage", kwargs, session=session
+    )
+    assert len(attribute_queries) == 2
+
+
+def test_root_needs_no_query(attribute_queries):
+    from dirac_rucio_policy.permission import has_permission
+
+    assert has_permission(InternalAccount("root"), "add_rse", {}, session=StubSession())
+    assert len(attribute_queries) == 0
+
+
+def test_no_session_no_cache(attribute_queries):
+    from dirac_rucio_policy.permission import has_permission
+
+    issuer = InternalAccount("alice")
+    assert not has_permission(issuer, "add_rse", {})
+    assert not has_permission(issuer, "add_rse", {})
+    assert len(attribute_queries) == 2
+
+
+def test_privilege_cache(attribute_queries, scope_owner, privilege_cache):
+    from dirac_rucio_policy.permission import has_permission
+
+    issuer = InternalAccount("alice")
+    kwargs = {"scope": InternalScope("alice")}
+
+    # different requests share the cached privileges
+    for _ in range(3):
+        assert has_permission(issuer, "set_metadata", kwargs, session=StubSession())
+        assert not has_permission(issuer, "add_rse", {}, session=StubSession())
+
+    kwargs = {"scope": InternalScope("bob")}
+    assert not has_permission(issuer, "set_metadata", kwargs, session=StubSession())
+    assert len(attribute_queries) == 1
+    assert privilege_cache.misses == 1
+
+
+def test_privilege_cache_invalidation(attribute_queries, scope_owner, privilege_cache):
+    from dirac_rucio_policy.permission import has_permission
+
+    admin = InternalAccount("admin")
+    alice = InternalAccount("alice")
+    assert not has_permission(alice, "add_rse", {}, session=StubSession())
+    assert has_permission(admin, "add_rse", {}, session=StubSession())
+    assert len(privilege_cache) == 2
+
+    # denied, nothing changes
+    kwargs = {"account": admin, "key": "admin"}
+    assert not has_permission(alice, "del_attribute", kwargs, session=StubSession())
+    assert len(privilege_cache) == 2
+
+    kwargs = {"account": alice, "key": "admin", "value": True}
+    assert has_permission(admin, "add_attribute", kwargs, session=StubSession())
+    assert len(privilege_cache) == 1
+    assert alice not in privilege_cache._data
+
+
+@pytest.fixture
+def rse_countries(monkeypatch):
+    """RSEs "DE" and "FR" in the country of the same name, without DB access."""
+    from dirac_rucio_policy import permission
+
+    def list_rse_attributes(rse_id, *, session):
+        return {"country": rse_id.lower()}
+
+    def resolve_rse_countries(issuer, rse_expression, *, session=None):
+        return {rse.lower() for rse in rse_expression.split("|")}
+
+    monkeypatch.setattr(permission, "list_rse_attributes", list_rse_attributes)
+    monkeypatch.setattr(permission, "_resolve_rse_countries", resolve_rse_countries)
+
+
+ACCOUNT_LIMIT_REQUESTS = [
+    ("set_local_account_limit", {"rse_id": "DE"}, True),
+    ("set_local_account_limit", {"rse_id": "FR"}, False),
+    ("delete_local_account_limit", {"rse_id": "DE"}, True),
+    ("delete_local_account_limit", {"rse_id": "FR"}, False),
+    ("set_global_account_limit", {"rse_expression": "DE"}, True),
+    ("set_global_account_limit", {"rse_expression": "DE|FR"}, False),
+    ("delete_global_account_limit", {"rse_expression": "DE"}, True),
+    ("delete_global_account_limit", {"rse_expression": "DE|FR"}, False),
+    ("get_local_account_usage", {}, True),
+    ("get_global_account_usage", {}, True),
+]
+
+
+def test_country_admin_one_query_per_request(attribute_queries, rse_countries):
+    from dirac_rucio_policy.permission import has_permission
+    from dirac_rucio_policy.privileges import country_admin_countries
+
+    country_admin = InternalAccount("country")
+    alice = InternalAccount("alice")
+    for _ in range(2):
+        session = StubSession()
+        for action, kwargs, allowed in ACCOUNT_LIMIT_REQUESTS:
+            kwargs = {"account": InternalAccount("bob"), **kwargs}
+            result = has_permission(country_admin, action, kwargs, session=session)
+            assert result == allowed, action
+            assert not has_permission(alice, action, kwargs, session=session), action
+        countries = country_admin_countries(country_admin, session=session)
+        assert countries == frozenset({"de"})
+    # one query for each issuer in each request
+    assert len(attribute_queries) == 4
+
+
+def test_country_admin_privilege_cache(
+    attribute_queries, scope_owner, rse_countries, privilege_cache
+):
+    from dirac_rucio_policy.permission import has_permission
+    from dirac_rucio_policy.privileges import country_admin_countries
+
+    country_admin = InternalAccount("country")
+    for _ in range(3):
+        session = StubSession()
+        for action, kwargs, allowed in ACCOUNT_LIMIT_REQUESTS:
+            kwargs = {"account": InternalAccount("bob"), **kwargs}
+            result = has_permission(country_admin, action, kwargs, session=session)
+            assert result == allowed, action
+    assert len(attribute_queries) == 1
+
+    # the countries are resolved again once the attributes change
+    session = StubSession()
+    kwargs = {"account": country_admin, "key": "country-de"}
+    assert has_permission(InternalAccount("root"), "del_attribute", kwargs)
+    attribute_queries.clear()
+    assert country_admin_countries(country_admin, session=session) == {"de"}
+    assert len(attribute_queries) == 1
+
+
+def test_register_permission(monkeypatch):
+    from dirac_rucio_policy import permission
+
+    monkeypatch.setattr(permission, "PERMISSIONS", dict(permission.PERMISSIONS))
+    issuer = InternalAccount("alice")
+
+    @permission.register_permission("add_rse")
+    def perm_add_rse(issuer, kwargs, *, session=None):
+        return issuer.external == "alice"
+
+    assert permission.has_permission(issuer, "add_rse", {})
+
+    permission.register_permission("my_action", lambda issuer, kwargs, session: True)
+    assert permission.has_permission(issuer, "my_action", {})
+
+
+def test_has_permissions_bulk(attribute_queries, scope_owner):
+    from dirac_rucio_policy.permission import has_permission, has_permissions_bulk
+
+    issuer = InternalAccount("alice")
+    requests = [
+        ("set_metadata", {"scope": InternalScope(scope)})
+        for scope in ["alice", "bob"] * 50
+    ]
+    requests.append(("add_dids", {"dids": [{"rules": [{"account": issuer}]}]}))
+    requests.append(("get_request_by_did", {}))
+
+    expected = [has_permission(issuer, action, kwargs) for action, kwargs in requests]
+    attribute_queries.clear()
+    scope_owner.clear()
+
+    result = has_permissions_bulk(issuer, requests, session=StubSession())
+    assert result == expected
+    assert result == [True, False] * 50 + [False, True]
+    assert len(attribute_queries) == 1
+    assert scope_owner == [("owned_scopes", issuer)]
+
+
+def test_has_permissions_bulk_root(attribute_queries, scope_owner):
+    from dirac_rucio_policy.permission import has_permissions_bulk
+
+    requests = [("set_metadata", {"scope": InternalScope("alice")})] * 10
+    result = has_permissions_bulk(InternalAccount("root"), requests)
+    assert result == [True] * 10
+    assert len(attribute_queries) == 0
+    assert len(scope_owner) == 0
+
+
+@pytest.mark.parametrize("status", ["ACTIVE", "SUSPENDED"])
+def test_admin_independent_of_status(db_session, status):
+    from rucio.core.account import add_account, add_account_attribute, update_account
+    from rucio.db.sqla.constants import AccountStatus, AccountType
+
+    from dirac_rucio_policy.permission import has_permission
+    from dirac_rucio_policy.profiling import profile_queries
+
+    bob = InternalAccount("bob")
+    add_account(bob, AccountType.USER, "bob@example.org", session=db_session)
+    add_account_attribute(bob, "admin", True, session=db_session)
+    update_account(bob, "status", AccountStatus[status], session=db_session)
+    db_session.flush()
+
+    # like rucio's has_account_attribute, the status of the account is not checked
+    with profile_queries() as profiler:
+        assert has_permission(bob, "add_rse", {}, session=db_session)
+    assert profiler.as_dict()["add_rse"]["queries"] == 1
+
+
+@pytest.mark.parametrize("status", ["ACTIVE", "SUSPENDED"])
+def test_country_admin_status(db_session, status):
+    from rucio.core.account import add_account, add_account_attribute, update_account
+    from rucio.db.sqla.constants import AccountStatus, AccountType
+
+    from dirac_rucio_policy.permission import has_permission
+
+    bob = InternalAccount("bob")
+    add_account(bob, AccountType.USER, "bob@example.org", session=db_session)
+    add_account_attribute(bob, "country-de", "admin", session=db_session)
+    update_account(bob, "status", AccountStatus[status], session=db_session)
+    db_session.flush()
+
+    # like rucio's list_account_attributes, only active country admins count
+    kwargs = {"account": InternalAccount("root")}
+    result = has_permission(bob, "get_local_account_usage", kwargs, session=db_session)
+    assert result == (status == "ACTIVE")
+
+
+@pytest.mark.parametrize("cache_size", [0, 10])
+def test_bulk_deleted_scope(db_session, cache_size):
+    from rucio.core.account import add_account
+    from rucio.core.scope import add_scope
+    from rucio.db.sqla import models
+    from rucio.db.sqla.constants import AccountType, ScopeStatus
+    from sqlalchemy import update
+
+    from dirac_rucio_policy.permission import has_permission, has_permissions_bulk
+    from dirac_rucio_policy.privileges import PRIVILEGE_CACHE
+
+    alice = InternalAccount("alice")
+    add_account(alice, AccountType.USER, "alice@example.org", session=db_session)
+    for scope in ("active", "deleted"):
+        add_scope(InternalScope(scope), alice, session=db_session)
+    db_session.execute(
+        update(models.Scope)
+        .where(models.Scope.scope == InternalScope("deleted"))
+        .values(status=ScopeStatus.DELETED)
+    )
+
+    requests = [
+        ("set_metadata", {"scope": InternalScope(scope)})
+        for scope in ("active", "deleted", "other")
+    ]
+    maxsize, ttl = PRIVILEGE_CACHE.maxsize, PRIVILEGE_CACHE.ttl
+    PRIVILEGE_CACHE.configure(maxsize=cache_size, ttl=60)
+    try:
+        # ownership of deleted scopes is checked as by rucio's is_scope_owner
+        single = [
+            has_permission(alice, action, kwargs, session=db_session)
+            for action, kwargs in requests
+        ]
+        bulk = has_permissions_bulk(alice, requests, session=db_session)
+    finally:
+        PRIVILEGE_CACHE.configure(maxsize=maxsize, ttl=ttl)
+        PRIVILEGE_CACHE.clear()
+    assert single == bulk == [True, True, False]
+
+
+def perm_add_replicas_chain(issuer, kwargs):
+    """The suffix checks of perm_add_replicas before they were configurable."""
+    return (
+        str(kwargs.get("rse", "")).endswith("SCRATCHDISK")
+        or str(kwargs.get("rse", "")).endswith("USERDISK")
+        or str(kwargs.get("rse", "")).endswith("MOCK")
+        or str(kwargs.get("rse", "")).endswith("LOCALGROUPDISK")
+        or issuer.external in ("root", "admin")
+    )
+
+
+ADD_REPLICAS_KWARGS = [
+    {"rse": rse}
+    for rse in [
+        "CTAO-SCRATCHDISK",
+        "USERDISK",
+        "SITE_MOCK",
+        "DESY-LOCALGROUPDISK",
+        "DESY-DISK",
+        "MOCK-DISK",
+        "",
+        None,
+    ]
+] + [{}]
+
+
+@pytest.mark.parametrize("issuer", ["alice", "admin", "root"])
+def test_add_replicas_suffixes(attribute_queries, issuer):
+    from dirac_rucio_policy.permission import has_permission
+
+    issuer = InternalAccount(issuer)
+    for kwargs in ADD_REPLICAS_KWARGS:
+        assert has_permission(issuer, "add_replicas", kwargs) == (
+            perm_add_replicas_chain(issuer, kwargs)
+        ), kwargs
+
+
+def test_add_replicas_configured_suffixes(attribute_queries, monkeypatch):
+    from dirac_rucio_policy import permission
+
+    assert permission._parse_suffixes(" A_DISK, ,B ") == ("A_DISK", "B")
+    monkeypatch.setattr(permission, "ADD_REPLICAS_RSE_SUFFIXES", ("_TMP",))
+
+    alice = InternalAccount("alice")
+    assert permission.has_permission(alice, "add_replicas", {"rse": "SITE_TMP"})
+    assert not permission.has_permission(alice, "add_replicas", {"rse": "SITE-MOCK"})
+
+    monkeypatch.setattr(permission, "ADD_REPLICAS_RSE_SUFFIXES", ())
+    assert not permission.has_permission(alice, "add_replicas", {"rse": "SITE_TMP"})
+
+
+@pytest.mark.parametrize("issuer", ["alice", "admin", "root"])
+def test_add_replicas_bulk(attribute_queries, issuer):
+    from dirac_rucio_policy.permission import has_permission, perm_add_replicas_bulk
+
+    issuer = InternalAccount(issuer)
+    expected = [
+        has_permission(issuer, "add_replicas", kwargs) for kwargs in ADD_REPLICAS_KWARGS
+    ]
+    attribute_queries.clear()
+
+    assert (
+        perm_add_replicas_bulk(issuer, ADD_REPLICAS_KWARGS, session=StubSession())
+        == expected
+    )
+    assert len(attribute_queries) == (0 if issuer.external == "root" else 1)
+
+    # privileges are not needed if all RSEs accept replicas from every account
+    attribute_queries.clear()
+    assert perm_add_replicas_bulk(issuer, ADD_REPLICAS_KWARGS[:4]) == [True] * 4
+    assert perm_add_replicas_bulk(issuer, []) == []
+    assert len(attribute_queries) == 0
+
+
+class FakeScopeCore:
+    """Stand-in for rucio.core.scope, owners is a mapping of scope to account."""
+
+    def __init__(self, owners):
+        self.owners = owners
+        self.queries = 0
+
+    def is_scope_owner(self, scope, account, *, session):
+        self.queries += 1
+        return self.owners.get(scope.external) == account.external
+
+
+@pytest.fixture
+def scope_owner_cache(monkeypatch):
+    import rucio.core
+
+    from dirac_rucio_policy.privileges import SCOPE_OWNER_CACHE
+
+    fake = FakeScopeCore({"alice": "alice"})
+    monkeypatch.setattr(rucio.core, "scope", fake)
+
+    maxsize, ttl = SCOPE_OWNER_CACHE.maxsize, SCOPE_OWNER_CACHE.ttl
+    SCOPE_OWNER_CACHE.configure(maxsize=10, ttl=60)
+    yield fake
+    SCOPE_OWNER_CACHE.configure(maxsize=maxsize, ttl=ttl)
+
+
+def test_scope_owner_cache(attribute_queries, scope_owner_cache):
+    from dirac_rucio_policy.permission import has_permission
+
+    alice = InternalAccount("alice")
+    for scope in ("alice", "bob"):
+        kwargs = {"scope": InternalScope(scope)}
+        for action in ("set_metadata", "set_metadata_bulk", "attach_dids"):
+            expected = scope == "alice"
+            assert (
+                has_permission(alice, action, kwargs, session=StubSession()) is expected
+            )
+
+    assert scope_owner_cache.queries == 2
+
+
+def test_scope_owner_cache_add_scope(attribute_queries, scope_owner_cache):
+    from dirac_rucio_policy.permission import has_permission
+
+    admin = InternalAccount("admin")
+    alice = InternalAccount("alice")
+    kwargs = {"scope": InternalScope("new")}
+    assert not has_permission(alice, "set_metadata", kwargs, session=StubSession())
+
+    # not allowed, does not invalidate the cache
+    add_scope = {"scope": InternalScope("new"), "account": alice}
+    assert not has_permission(alice, "add_scope", add_scope, session=StubSession())
+    scope_owner_cache.owners["new"] = "alice"
+    assert not has_permission(alice, "set_metadata", kwargs, session=StubSession())
+    assert scope_owner_cache.queries == 1
+
+    assert has_permission(admin, "add_scope", add_scope, session=StubSession())
+    assert has_permission(alice, "set_metadata", kwargs, session=StubSession())
+    assert scope_owner_cache.queries == 2
+
+
+@pytest.fixture
+def permission_stats():
+    from dirac_rucio_policy.permission import PERMISSION_STATS
+
+    sample_rate = PERMISSION_STATS.sample_rate
+    PERMISSION_STATS.configure(1.0)
+    yield PERMISSION_STATS
+    PERMISSION_STATS.configure(sample_rate)
+
+
+def test_permission_stats(attribute_queries, permission_stats):
+    from dirac_rucio_policy.permission import has_permission
+
+    root = InternalAccount("root")
+    alice = InternalAccount("alice")
+    assert has_permission(root, "add_rse", {})
+    assert not has_permission(alice, "add_rse", {})
+    assert has_permission(root, "add_account", {})
+
+    actions = permission_stats.as_dict()["actions"]
+    assert actions.keys() == {"add_rse", "add_account"}
+    assert (actions["add_rse"]["allowed"], actions["add_rse"]["denied"]) == (1, 1)
+    assert actions["add_rse"]["latency"]["count"] == 2
+
+    # nothing is recorded for calls that are not sampled
+    permission_stats.configure(0.0)
+    assert has_permission(root, "add_rse", {})
+    assert permission_stats.as_dict()["actions"] == {}
@@ -0,0 +1,73 @@
+from rucio.common.types import InternalAccount
+from sqlalchemy import text
+
+
+def test_profile_queries(db_session, monkeypatch):
+    from dirac_rucio_policy import permission, profiling
+
+    def perm_queries(issuer, kwargs, *, session=None):
+        for _ in range(kwargs["n"]):
+            session.execute(text("SELECT 1"))
+        return True
+
+    monkeypatch.setitem(permission.PERMISSIONS, "test_queries", perm_queries)
+    root = InternalAccount("root")
+
+    with profiling.profile_queries() as profiler:
+        assert profiling.active is profiler
+        for n in (3, 1):
+            permission.has_permission(
+                root, "test_queries", {"n": n}, session=db_session
+            )
+        # root needs no queries
+        permission.has_permission(root, "add_rse", {}, session=db_session)
+
+    assert profiling.active is None
+    assert profiler.as_dict() == {
+        "test_queries": {
+            "calls": 2,
+            "queries": 4,
+            "max_queries": 3,
+            "statements": {"SELECT 1": 4},
+        },
+        "add_rse": {"calls": 1, "queries": 0, "max_queries": 0, "statements": {}},
+    }
+
+    # listeners are removed once the profiler is closed
+    permission.has_permission(root, "test_queries", {"n": 1}, session=db_session)
+    assert profiler.as_dict()["test_queries"]["calls"] == 2
+
+
+def test_profile_account_limits(db_session, country_admin):
+    from rucio.core.rse import get_rse_id
+
+    from dirac_rucio_policy.permission import has_permission
+    from dirac_rucio_policy.profiling import profile_queries
+
+    rse_ids = [
+        get_rse_id(f"COUNTRY-{i}", vo="def", session=db_session) for i in range(6)
+    ]
+    with profile_queries() as profiler:
+        allowed = [
+            has_permission(
+                country_admin,
+                "set_local_account_limit",
+                {"account": country_admin, "rse_id": rse_id, "bytes": 1},
+                session=db_session,
+            )
+            for rse_id in rse_ids
+        ]
+    assert allowed == [True] * 5 + [False]
+
+    queries = profiler.as_dict()["set_local_account_limit"]
+    assert queries["calls"] == 6
+    attribute_queries = {
+        statement: count
+        for statement, count in queries["statements"].items()
+        if "FROM rse_attr_map" in statement
+    }
+    # the attributes of the RSE are queried in each call
+    assert list(attribute_queries.values()) == [6]
+
+    report = profiler.report()
+    assert report.splitlines()[1].startswith("set_local_account_limit")
@@ -0,0 +1,187 @@
+import pytest
+
+
+@pytest.fixture
+def country_cache():
+    from dirac_rucio_policy.rses import RSE_COUNTRY_CACHE
+
+    RSE_COUNTRY_CACHE.configure(maxsize=100, ttl=60)
+    yield RSE_COUNTRY_CACHE
+    RSE_COUNTRY_CACHE.configure(maxsize=0, ttl=60)
+    RSE_COUNTRY_CACHE.clear()
+
+
+def rse_ids(session, n=6):
+    from rucio.core.rse import get_rse_id
+
+    return [get_rse_id(f"COUNTRY-{i}", vo="def", session=session) for i in range(n)]
+
+
+def test_query_rse_countries(db_session, country_admin, monkeypatch):
+    from rucio.core.rse import add_rse
+
+    from dirac_rucio_policy import db, rses
+
+    ids = rse_ids(db_session)
+    no_country = add_rse("NO-COUNTRY", vo="def", session=db_session)
+    expected = dict(zip(ids, ["de"] * 5 + ["fr"]))
+
+    assert rses.query_rse_countries(ids + [no_country], session=db_session) == expected
+    assert rses.query_rse_countries([], session=db_session) == {}
+
+    # large lists are split into several queries
+    monkeypatch.setattr(db, "MAX_IN_CLAUSE", 4)
+    assert rses.query_rse_countries(ids, session=db_session) == expected
+
+    countries = rses.rse_countries([no_country] + ids, session=db_session)
+    assert list(countries) == [no_country] + ids
+    assert countries == {no_country: None, **expected}
+
+
+def test_rse_countries_cache(db_session, country_admin, country_cache):
+    from dirac_rucio_policy.profiling import QueryProfiler
+    from dirac_rucio_policy.rses import invalidate_rse_countries, rse_countries
+
+    ids = rse_ids(db_session)
+    profiler = QueryProfiler()
+    try:
+        with profiler.track("countries", db_session):
+            rse_countries(ids[:3], session=db_session)
+            rse_countries(ids, session=db_session)
+            rse_countries(ids, session=db_session)
+            invalidate_rse_countries(ids[0])
+            rse_countries(ids, session=db_session)
+    finally:
+        profiler.close()
+
+    # the first three, the remaining three and the invalidated one
+    assert profiler.as_dict()["countries"]["queries"] == 3
+    assert country_cache.misses == 7
+
+    invalidate_rse_countries()
+    assert len(country_cache) == 0
+
+
+def test_global_account_limit(db_session, country_admin):
+    from rucio.common.types import InternalAccount
+
+    from dirac_rucio_policy.permission import has_permission
+    from dirac_rucio_policy.profiling import profile_queries
+
+    def allowed(action, rse_expression, issuer=country_admin):
+        kwargs = {"account": issuer, "rse_expression": rse_expression, "bytes": 1}
+        return has_permission(issuer, action, kwargs, session=db_session)
+
+    with profile_queries() as profiler:
+        for action in ("set_global_account_limit", "delete_global_account_limit"):
+            assert allowed(action, "country=de")
+            assert allowed(action, "COUNTRY-0|COUNTRY-1")
+            assert not allowed(action, "country=fr")
+            assert not allowed(action, "COUNTRY-0|COUNTRY-5")
+
+    # a single query for the countries of all RSEs in the expression
+    queries = profiler.as_dict()
+    for action in ("set_global_account_limit", "delete_global_account_limit"):
+        attribute_queries = sum(
+            count
+            for statement, count in queries[action]["statements"].items()
+            if "FROM rse_attr_map" in statement
+            and "rse_attr_map.rse_id IN" in statement
+        )
+        assert attribute_queries == 4
+
+    # users without country admin privileges
+    user = InternalAccount("user")
+    assert not allowed("delete_global_account_limit", "country=de", user)
+    assert not allowed("set_global_account_limit", "country=de", user)
+
+
+def test_country_attribute_invalidates(db_session, country_admin, country_cache):
+    from rucio.common.types import InternalAccount
+
+    from dirac_rucio_policy.permission import has_permission
+
+    ids = rse_ids(db_session)
+    root = InternalAccount("root")
+    kwargs = {"account": country_admin, "rse_expression": "COUNTRY-5", "bytes": 1}
+    action = "set_global_account_limit"
+
+    assert not has_permission(country_admin, action, kwargs, session=db_session)
+    assert ids[5] in country_cache._data
+
+    # other attributes keep the cached country
+    has_permission(
+        root,
+        "add_rse_attribute",
+        {"rse": "COUNTRY-5", "rse_id": ids[5], "key": "tier", "value": "1"},
+        session=db_session,
+    )
+    assert ids[5] in country_cache._data
+
+    has_permission(
+        root,
+        "add_rse_attribute",
+        {"rse": "COUNTRY-5", "rse_id": ids[5], "key": "country", "value": "de"},
+        session=db_session,
+    )
+    assert ids[5] not in country_cache._data
+
+
+@pytest.fixture
+def expression_cache():
+    from dirac_rucio_policy.rses import RSE_EXPRESSION_CACHE
+
+    RSE_EXPRESSION_CACHE.configure(maxsize=100, ttl=30)
+    yield RSE_EXPRESSION_CACHE
+    RSE_EXPRESSION_CACHE.configure(maxsize=0, ttl=30)
+    RSE_EXPRESSION_CACHE.clear()
+
+
+def test_resolve_rse_expression(db_session, country_admin, expression_cache):
+    from rucio.common.exception import InvalidRSEExpression
+
+    from dirac_rucio_policy.rses import resolve_rse_expression
+
+    ids = rse_ids(db_session)
+    de = resolve_rse_expression("country=de", "def", session=db_session)
+    assert set(de) == set(ids[:5])
+    assert resolve_rse_expression("country=fr", "def", session=db_session) == (ids[5],)
+    assert resolve_rse_expression("country=de", "def", session=db_session) == de
+    assert expression_cache.hits == 1
+    assert len(expression_cache) == 2
+
+    # the VO is part of the key, expressions without matches are not cached
+    with pytest.raises(InvalidRSEExpression):
+        resolve_rse_expression("country=de", "abc", session=db_session)
+    with pytest.raises(InvalidRSEExpression):
+        resolve_rse_expression("country=de&(", "def", session=db_session)
+    assert len(expression_cache) == 2
+
+
+@pytest.mark.parametrize(
+    "action, kwargs",
+    [
+        ("add_rse", {"rse": "NEW"}),
+        ("update_rse", {"rse": "COUNTRY-0", "rse_id": None}),
+        ("del_rse", {"rse": "COUNTRY-0", "rse_id": None}),
+        ("add_rse_attribute", {"rse": "COUNTRY-0", "key": "tier", "value": "1"}),
+        ("del_rse_attribute", {"rse": "COUNTRY-0", "key": "tier"}),
+    ],
+)
+def test_rse_expression_invalidation(
+    db_session, country_admin, expression_cache, action, kwargs
+):
+    from rucio.common.types import InternalAccount
+
+    from dirac_rucio_policy.permission import has_permission
+    from dirac_rucio_policy.rses import resolve_rse_expression
+
+    resolve_rse_expression("country=de", "def", session=db_session)
+    assert len(expression_cache) == 1
+
+    # denied actions do not change anything
+    assert not has_permission(country_admin, action, kwargs, session=db_session)
+    assert len(expression_cache) == 1
+
+    assert has_permission(InternalAccount("root"), action, kwargs, session=db_session)
+    assert len(expression_cache) == 0
@@ -0,0 +1,332 @@
+import itertools
+
+import pytest
+from rucio.common.types import InternalAccount, InternalScope
+
+ISSUERS = ["root", "admin", "suspended", "country", "exiled", "alice", "bob", "carol"]
+SCOPES = ["alice", "bob", "gone", "mock"]
+
+
+@pytest.fixture
+def privileges(monkeypatch):
+    """Fake attributes and scopes of the synthetic issuers, returns the queries."""
+    import rucio.core.scope
+
+    from dirac_rucio_policy import privileges
+
+    attributes = {
+        "admin": {"admin": True},
+        "country": {"country-de": "admin", "country-fr": "user"},
+        "alice": {"country-de": "user"},
+    }
+    queries = []
+
+    def query_account_attributes(account, *, session):
+        queries.append("attributes")
+        return attributes.get(account.external, {})
+
+    def is_scope_owner(scope, account, *, session):
+        queries.append("scope_owner")
+        return scope.external == account.external
+
+    monkeypatch.setattr(
+        privileges, "query_account_attributes", query_account_attributes
+    )
+    monkeypatch.setattr(rucio.core.scope, "is_scope_owner", is_scope_owner)
+    monkeypatch.setattr(
+        privileges, "is_account_active", lambda account, *, session: True
+    )
+    return queries
+
+
+@pytest.fixture
+def accounts(db_session):
+    """Accounts and scopes of the synthetic issuers in the database."""
+    from rucio.core.account import add_account, add_account_attribute, update_account
+    from rucio.core.scope import add_scope
+    from rucio.db.sqla import models
+    from rucio.db.sqla.constants import AccountStatus, AccountType, ScopeStatus
+    from sqlalchemy import update
+
+    attributes = {
+        "root": {},
+        "admin": {"admin": True},
+        "suspended": {"admin": True},
+        "country": {"country-de": "admin", "country-fr": "user"},
+        "exiled": {"country-de": "admin"},
+        "alice": {"country-de": "user"},
+        "bob": {},
+    }
+    for name, account_attributes in attributes.items():
+        account = InternalAccount(name)
+        add_account(account, AccountType.USER, "test@example.org", session=db_session)
+        for key, value in account_attributes.items():
+            add_account_attribute(account, key, value, session=db_session)
+    for name in ("suspended", "exiled"):
+        update_account(
+            InternalAccount(name), "status", AccountStatus.SUSPENDED, session=db_session
+        )
+
+    for scope, account in [("alice", "alice"), ("bob", "bob"), ("gone", "alice")]:
+        add_scope(InternalScope(scope), InternalAccount(account), session=db_session)
+    db_session.execute(
+        update(models.Scope)
+        .where(models.Scope.scope == InternalScope("gone"))
+        .values(status=ScopeStatus.DELETED)
+    )
+    db_session.flush()
+    return db_session
+
+
+def _root(issuer, kwargs, session):
+    return issuer.external == "root"
+
+
+def _root_or_admin(issuer, kwargs, session):
+    from rucio.core.account import has_account_attribute
+
+    return issuer.external == "root" or has_account_attribute(
+        account=issuer, key="admin", session=session
+    )
+
+
+def _scope_owner_or_mock(issuer, kwargs, session):
+    import rucio.core.scope
+
+    return (
+        _root_or_admin(issuer, kwargs, session)
+        or rucio.core.scope.is_scope_owner(
+            scope=kwargs["scope"], account=issuer, session=session
+        )
+        or kwargs["scope"].external == "mock"
+    )
+
+
+def _scope_owner(issuer, kwargs, session):
+    import rucio.core.scope
+
+    return _root_or_admin(issuer, kwargs, session) or rucio.core.scope.is_scope_owner(
+        scope=kwargs["scope"], account=issuer, session=session
+    )
+
+
+def _account_usage(issuer, kwargs, session):
+    from rucio.core.account import list_account_attributes
+
+    if _root_or_admin(issuer, kwargs, session) or kwargs.get("account") == issuer:
+        return True
+    for kv in list_account_attributes(account=issuer, session=session):
+        if kv["key"].startswith("country-") and kv["value"] == "admin":
+            return True
+    return False
+
+
+def _remove_did_from_followed(issuer, kwargs, session):
+    return (
+        _root_or_admin(issuer, kwargs, session)
+        or kwargs["account"] == issuer
+        or kwargs["scope"].external == "mock"
+    )
+
+
+def _remove_dids_from_followed(issuer, kwargs, session):
+    if _root_or_admin(issuer, kwargs, session):
+        return True
+    if not kwargs["account"] == issuer:
+        return False
+    return True
+
+
+def _legacy_allowed(legacy, issuer, kwargs, session):
+    from rucio.common.exception import AccountNotFound
+
+    try:
+        return legacy(issuer, kwargs, session)
+    except AccountNotFound:
+        # list_account_attributes refuses unknown and inactive accounts
+        return False
+
+
+#: the permission checks replaced by rules, as they were implemented before
+LEGACY = {
+    **dict.fromkeys(
+        [
+            "add_account",
+            "del_account",
+            "declare_bad_file_replicas",
+            "queue_requests",
+            "cancel_request",
+            "get_next",
+            "set_rse_usage",
+            "list_heartbeats",
+            "get_signed_url",
+            "add_bad_pfns",
+            "export",
+        ],
+        _root,
+    ),
+    **dict.fromkeys(
+        [
+            "update_account",
+            "add_subscription",
+            "add_scope",
+            "add_rse",
+            "update_rse",
+            "add_protocol",
+            "del_protocol",
+            "update_protocol",
+            "add_qos_policy",
+            "delete_qos_policy",
+            "skip_availability_check",
+            "update_replicas_states",
+            "add_rse_attribute",
+            "del_rse_attribute",
+            "del_rse",
+            "del_rule",
+            "update_rule",
+            "approve_rule",
+            "update_subscription",
+            "reduce_rule",
+            "move_rule",
+            "add_account_identity",
+            "set_rse_limits",
+            "list_requests",
+            "list_requests_history",
+            "get_request_history_by_did",
+            "config_sections",
+            "config_add_section",
+            "config_has_section",
+            "config_options",
+            "config_has_option",
+            "config_get",
+            "config_items",
+            "config_set",
+            "config_remove_section",
+            "config_remove_option",
+            "add_attribute",
+            "del_attribute",
+            "resurrect",
+            "del_account_identity",
+        ],
+        _root_or_admin,
+    ),
+    **dict.fromkeys(
+        [
+            "declare_suspicious_file_replicas",
+            "get_request_by_did",
+            "get_auth_token_ssh",
+        ],
+        lambda issuer, kwargs, session: True,
+    ),
+    "delete_replicas": lambda issuer, kwargs, session: False,
+    **dict.fromkeys(
+        ["attach_dids", "detach_dids", "create_did_sample"], _scope_owner_or_mock
+    ),
+    **dict.fromkeys(["set_metadata", "set_metadata_bulk"], _scope_owner),
+    **dict.fromkeys(
+        ["get_local_account_usage", "get_global_account_usage"], _account_usage
+    ),
+    "remove_did_from_followed": _remove_did_from_followed,
+    "remove_dids_from_followed": _remove_dids_from_followed,
+}
+
+
+def synthetic_requests():
+    for issuer, account, scope in itertools.product(ISSUERS, ISSUERS, SCOPES):
+        kwargs = {
+            "account": InternalAccount(account),
+            "scope": InternalScope(scope),
+            "key": "name",
+        }
+        yield InternalAccount(issuer), kwargs
+
+
+def test_rules_cover_legacy():
+    from dirac_rucio_policy.permission import PERMISSIONS, RULES
+
+    assert set(RULES) == set(LEGACY)
+    for action in RULES:
+        assert PERMISSIONS[action].__name__ == f"perm_{action}"
+
+
+@pytest.mark.parametrize("action", sorted(LEGACY))
+def test_rules_equivalence(accounts, action):
+    from dirac_rucio_policy.permission import PERMISSIONS, has_permissions_bulk
+
+    check = PERMISSIONS[action]
+    legacy = LEGACY[action]
+    results = {}
+    for issuer, kwargs in synthetic_requests():
+        allowed = _legacy_allowed(legacy, issuer, kwargs, accounts)
+        assert check(issuer, kwargs, session=accounts) is allowed, (issuer, kwargs)
+        results.setdefault(issuer, []).append((kwargs, allowed))
+
+    # the bulk checks resolve all privileges of an issuer at once
+    for issuer, requests in results.items():
+        bulk = [(action, kwargs) for kwargs, _ in requests]
+        allowed = has_permissions_bulk(issuer, bulk, session=accounts)
+        assert allowed == [expected for _, expected in requests], issuer
+
+
+def test_rules_missing_kwargs(privileges):
+    from dirac_rucio_policy.permission import PERMISSIONS, RULES
+    from dirac_rucio_policy.rules import ALLOW
+
+    # requests without account or scope are denied instead of raising KeyError
+    for action, rule in RULES.items():
+        expected = rule is ALLOW
+        for issuer in ("alice", "bob"):
+            allowed = PERMISSIONS[action](InternalAccount(issuer), {}, session=None)
+            assert allowed is expected, (action, issuer)
+
+
+def test_default_equivalence(accounts):
+    from dirac_rucio_policy.permission import has_permission
+
+    for issuer, kwargs in synthetic_requests():
+        expected = _root_or_admin(issuer, kwargs, accounts)
+        allowed = has_permission(issuer, "unknown_action", kwargs, session=accounts)
+        assert allowed is expected, (issuer, kwargs)
+
+
+def test_cheapest_first(privileges):
+    from dirac_rucio_policy.permission import PERMISSIONS
+
+    bob = InternalAccount("bob")
+    mock = {"account": bob, "scope": InternalScope("mock")}
+
+    # the mock scope is checked before the attributes and the scope owner
+    assert PERMISSIONS["attach_dids"](bob, mock)
+    assert PERMISSIONS["remove_did_from_followed"](bob, mock)
+    assert PERMISSIONS["get_local_account_usage"](bob, mock)
+    assert privileges == []
+
+    other = {"account": InternalAccount("carol"), "scope": InternalScope("alice")}
+    assert not PERMISSIONS["attach_dids"](bob, other)
+    assert privileges == ["attributes", "scope_owner"]
+
+
+def test_compile_rule():
+    from dirac_rucio_policy.rules import (
+        ADMIN,
+        ALLOW,
+        DENY,
+        MOCK_SCOPE,
+        ROOT,
+        ROOT_ONLY,
+        Rule,
+        compile_rule,
+    )
+
+    alice = InternalAccount("alice")
+    assert compile_rule(ALLOW)(alice, {})
+    assert not compile_rule(DENY)(alice, {})
+    assert compile_rule(ROOT_ONLY)(InternalAccount("root"), {})
+    assert not compile_rule(ROOT_ONLY)(alice, {})
+
+    check = compile_rule(Rule((ADMIN, MOCK_SCOPE, ROOT)), "perm_test")
+    assert check.__name__ == "perm_test"
+    # predicates of the same cost keep their order
+    assert check.__doc__ == "Allowed if any of: mock_scope, root, admin"
+    assert check(alice, {"scope": InternalScope("mock")})
+    assert compile_rule(DENY).__doc__ == "Always denied."
@@ -46,3 +46,49 @@ def test_scope_name_regexp():
     scope, name = m.group(1, 2)
     assert scope == true_scope
     assert name == lfn
+
+
+def test_split_scope_names():
+    from dirac_rucio_policy.schema import SCOPE_NAME_REGEXP, split_scope_names
+
+    urls = [
+        "foo/testvo.example.org/foo/bar/test.dat",
+        "dl0//ctao.org/dl0",
+        "user.alice/test",
+        "a/b\nc",
+    ]
+    expected = [re.match(SCOPE_NAME_REGEXP, f"/{url}").group(1, 2) for url in urls]
+    assert split_scope_names(urls) == expected
+    assert split_scope_names(iter(urls[:1])) == [
+        ("foo", "/testvo.example.org/foo/bar/test.dat")
+    ]
+    assert split_scope_names([]) == []
+
+    with pytest.raises(ValueError, match="Could not parse 'noslash'"):
+        split_scope_names(["foo/bar", "noslash"])
+
+
+invalid_objects = [
+    ("name", "foo"),
+    ("scope", "a" * 30),
+    ("account", "Root"),
+    ("did", {"scope": "foo", "name": "/foo/bar", "bytes": "1"}),
+    ("dids", [{"scope": "foo", "name": "bar"}]),
+    ("rule", {"dids": [], "copies": 1}),
+    ("attachment", {"scope": "foo", "name": "/foo", "dids": [{"scope": "foo"}]}),
+]
+
+
+@pytest.mark.parametrize(("name", "obj"), invalid_objects)
+def test_validate_schema_error(name, obj):
+    import jsonschema
+
+    from dirac_rucio_policy.schema import SCHEMAS, validate_schema
+
+    with pytest.raises(jsonschema.ValidationError) as expected:
+        jsonschema.validate(obj, SCHEMAS[name])
+
+    msg = f"Problem validating {name}: {expected.value}"
+    with pytest.raises(InvalidObject) as e:
+        validate_schema(name, obj)
+    assert e.value.args[0] == msg
@@ -0,0 +1,81 @@
+import json
+import math
+
+import pytest
+
+
+def test_histogram():
+    from dirac_rucio_policy.stats import LatencyHistogram
+
+    histogram = LatencyHistogram(buckets=[0.1, 1.0, math.inf])
+    for seconds in [0.05, 0.1, 0.5, 2.0]:
+        histogram.observe(seconds)
+
+    assert histogram.counts == [2, 1, 1]
+    assert histogram.cumulative() == [(0.1, 2), (1.0, 3), (math.inf, 4)]
+    assert histogram.count == 4
+    assert histogram.sum == pytest.approx(2.65)
+
+    with pytest.raises(ValueError, match="sorted"):
+        LatencyHistogram(buckets=[1.0, 0.1, math.inf])
+    with pytest.raises(ValueError, match="math.inf"):
+        LatencyHistogram(buckets=[0.1, 1.0])
+
+
+def test_disabled():
+    from dirac_rucio_policy.stats import PermissionStats
+
+    stats = PermissionStats()
+    assert not stats.enabled
+    assert stats.as_dict() == {"sample_rate": 0.0, "actions": {}}
+
+    with pytest.raises(ValueError):
+        stats.configure(1.5)
+
+
+def test_sampling():
+    from dirac_rucio_policy.stats import PermissionStats
+
+    values = iter([0.1, 0.5, 0.9])
+    stats = PermissionStats(sample_rate=0.5, rng=lambda: next(values))
+    assert stats.enabled
+    assert [stats.sample() for _ in range(3)] == [True, False, False]
+
+    # everything is recorded without drawing random numbers
+    stats.configure(1.0)
+    assert stats.sample()
+
+
+def test_dumps():
+    from dirac_rucio_policy.stats import PermissionStats
+
+    stats = PermissionStats(sample_rate=1.0, buckets=[1e-3, math.inf])
+    stats.record("add_rule", True, 2e-4)
+    stats.record("add_rule", False, 5e-3)
+    stats.record("add_did", True, 1e-4)
+
+    data = json.loads(stats.to_json())
+    assert list(data["actions"]) == ["add_did", "add_rule"]
+    add_rule = data["actions"]["add_rule"]
+    assert (add_rule["calls"], add_rule["allowed"], add_rule["denied"]) == (2, 1, 1)
+    assert add_rule["latency"]["buckets"] == {"0.001": 1, "+Inf": 2}
+    assert add_rule["latency"]["count"] == 2
+
+    text = stats.to_prometheus()
+    assert text.endswith("\n")
+    lines = text.splitlines()
+    assert "rucio_policy_permission_sample_rate 1.0" in lines
+    assert "# TYPE rucio_policy_permission_calls_total counter" in lines
+    assert (
+        'rucio_policy_permission_calls_total{action="add_rule",decision="denied"} 1'
+        in lines
+    )
+    assert "# TYPE rucio_policy_permission_duration_seconds histogram" in lines
+    assert (
+        'rucio_policy_permission_duration_seconds_bucket{action="add_rule",le="+Inf"} 2'
+        in lines
+    )
+    assert 'rucio_policy_permission_duration_seconds_count{action="add_did"} 1' in lines
+
+    stats.reset()
+    assert stats.as_dict()["actions"] == {}